@@ -0,0 +1,122 @@
+"""Admission control for workbook parsing shared by every session of the server.
+
+At most ``max_workers`` workbooks are parsed at once and at most
+``max_queued`` more wait for a slot; further uploads are turned away with
+ParseRejected instead of piling up parses until the host runs out of memory.
+Identical uploads parsed at the same time are parsed once: later callers wait
+for the first one's result instead of taking a slot.
+
+Configure with DASH_PARSE_WORKERS and DASH_PARSE_QUEUE.
+"""
+import os
+import threading
+from concurrent.futures import Future
+
+from ingest import ParseCancelled
+
+PARSE_WORKERS = int(os.environ.get('DASH_PARSE_WORKERS', '2'))
+PARSE_QUEUE = int(os.environ.get('DASH_PARSE_QUEUE', '16'))
+
+# How often waiting callers check their cancel event, in seconds
+POLL_INTERVAL = 0.1
+
+
+class ParseRejected(RuntimeError):
+    """Raised when the parse queue is full"""
+
+
+class ParseAdmission:
+    def __init__(self, max_workers=PARSE_WORKERS, max_queued=PARSE_QUEUE):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.running = 0
+        self.queued = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self._slots = threading.Semaphore(max_workers)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def run(self, key, parse, cancel=None):
+        """Return parse(), run in a free slot, or the result of an identical parse already under way.
+
+        key identifies the parse result, e.g. the parse cache key. Raises
+        ParseRejected when the queue is full and ParseCancelled when cancel is
+        set while waiting.
+        """
+        waited = False
+        while True:
+            with self._lock:
+                future = self._in_flight.get(key)
+                if future is None:
+                    if self.running + self.queued >= self.max_workers + self.max_queued:
+                        self.rejected += 1
+                        raise ParseRejected(
+                            f"{self.running} workbooks are being parsed and {self.queued} are queued; "
+                            "try again shortly")
+                    future = Future()
+                    self._in_flight[key] = future
+                    self.queued += 1
+                    break
+                if not waited:
+                    self.deduplicated += 1
+                    waited = True
+            try:
+                return self._wait(future, cancel)
+            except ParseCancelled:
+                if cancel is not None and cancel.is_set():
+                    raise
+                # The session that started the parse cancelled it; parse it ourselves
+
+        try:
+            self._acquire(cancel)
+        except BaseException as e:
+            with self._lock:
+                self.queued -= 1
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            result = parse()
+        except BaseException as e:
+            # Forget the parse before waiters see its outcome, so a retrying waiter starts a new one
+            self._finish(key)
+            future.set_exception(e)
+            raise
+        self._finish(key)
+        future.set_result(result)
+        return result
+
+    def _finish(self, key):
+        with self._lock:
+            self.running -= 1
+            del self._in_flight[key]
+        self._slots.release()
+
+    def _acquire(self, cancel):
+        while not self._slots.acquire(timeout=POLL_INTERVAL):
+            if cancel is not None and cancel.is_set():
+                raise ParseCancelled()
+
+    def _wait(self, future, cancel):
+        while True:
+            try:
+                return future.result(timeout=POLL_INTERVAL)
+            except TimeoutError:
+                if cancel is not None and cancel.is_set():
+                    raise ParseCancelled()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'running': self.running,
+                'queued': self.queued,
+                'deduplicated': self.deduplicated,
+                'rejected': self.rejected,
+            }
+
+
+parse_admission = ParseAdmission()
@@ -0,0 +1,144 @@
+"""Counting backends behind DataProcessor's analyses.
+
+Every analysis is built from three count arrays over the categorical codes and
+flags of the inspection frame: the performance cube, the backlog cells per
+item class, delay and SECE status, and the item class x month matrix. A
+backend only produces these arrays, so the results are assembled by the same
+code and are identical whichever backend counted.
+
+The pandas backend counts with numpy. The polars backend runs the same counts
+as multi-threaded lazy group-bys and needs the optional ``polars`` package.
+Pick one with ``DataProcessor(backend=...)`` or the DASH_BACKEND environment
+variable.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_BACKEND = os.environ.get('DASH_BACKEND', 'pandas')
+
+# Planned month 0 holds rows whose month is missing or outside 1-12
+N_MONTHS = 13
+
+
+def _codes(df, column):
+    return df[column].cat.codes.to_numpy(dtype=np.intp)
+
+
+class PandasBackend:
+    name = 'pandas'
+
+    def performance_counts(self, df, by=None):
+        """Performance cube from one bincount; see DataProcessor._performance_counts"""
+        month = df['PMonth_Num'].to_numpy(dtype=np.intp)
+        done = df['is_done'].to_numpy()
+        backlog = df['is_backlog'].to_numpy()
+        sce = df['is_sce'].to_numpy()
+        on_time = df['is_on_time'].to_numpy()
+
+        codes = (((month * 2 + done) * 2 + backlog) * 2 + sce) * 2 + on_time
+        if by is None:
+            return np.bincount(codes, minlength=N_MONTHS * 16).reshape(N_MONTHS, 2, 2, 2, 2)
+
+        group_codes = _codes(df, by)
+        in_group = group_codes >= 0
+        codes = group_codes[in_group] * (N_MONTHS * 16) + codes[in_group]
+        n_groups = len(df[by].cat.categories)
+        return np.bincount(codes, minlength=n_groups * N_MONTHS * 16).reshape(n_groups, N_MONTHS, 2, 2, 2, 2)
+
+    def backlog_cells(self, df):
+        """Backlog rows per [Item Class, Delay, SECE STATUS] category code"""
+        columns = ['Item Class', 'Delay', 'SECE STATUS']
+        shape = tuple(len(df[column].cat.categories) for column in columns)
+        backlog = df['is_backlog'].to_numpy()
+        codes = [_codes(df, column)[backlog] for column in columns]
+        labelled = np.logical_and.reduce([c >= 0 for c in codes])
+        cells = np.ravel_multi_index([c[labelled] for c in codes], shape)
+        return np.bincount(cells, minlength=int(np.prod(shape))).reshape(shape)
+
+    def item_class_month_counts(self, df):
+        """Rows per [Item Class, planned month, job done]; month 0 collects unplanned rows"""
+        codes = _codes(df, 'Item Class')
+        month = df['PMonth_Num'].to_numpy(dtype=np.intp)
+        done = df['is_done'].to_numpy()
+        n_classes = len(df['Item Class'].cat.categories)
+
+        has_class = codes >= 0
+        cells = (codes * N_MONTHS + month) * 2 + done
+        counts = np.bincount(cells[has_class], minlength=n_classes * N_MONTHS * 2)
+        return counts.reshape(n_classes, N_MONTHS, 2)
+
+
+class PolarsBackend:
+    name = 'polars'
+
+    def __init__(self):
+        try:
+            import polars as pl
+        except ImportError as e:
+            raise ImportError("The polars backend needs the optional polars package: pip install polars") from e
+        self.pl = pl
+
+    def _lazy(self, df, columns):
+        """LazyFrame of category codes and flags in their native dtypes; missing labels keep code -1"""
+        data = {}
+        for column in columns:
+            values = df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.cat.codes
+            data[column] = values.to_numpy()
+        return self.pl.LazyFrame(data)
+
+    def _count(self, lazy, keys, shape):
+        pl = self.pl
+        schema = lazy.collect_schema()
+        # Flags cannot be missing; codes and months are widened only once grouped
+        valid = [pl.col(key) >= 0 for key in keys if schema[key] != pl.Boolean]
+        if valid:
+            lazy = lazy.filter(pl.all_horizontal(valid))
+        grouped = (lazy
+                   .group_by(keys)
+                   .agg(pl.len().alias('rows'))
+                   .select(pl.col(keys).cast(pl.Int64), 'rows')
+                   .collect())
+        counts = np.zeros(int(np.prod(shape)), dtype=np.intp)
+        cells = np.ravel_multi_index([grouped[key].to_numpy() for key in keys], shape)
+        counts[cells] = grouped['rows'].to_numpy()
+        return counts.reshape(shape)
+
+    def performance_counts(self, df, by=None):
+        keys = ['PMonth_Num', 'is_done', 'is_backlog', 'is_sce', 'is_on_time']
+        shape = (N_MONTHS, 2, 2, 2, 2)
+        if by is not None:
+            keys = [by, *keys]
+            shape = (len(df[by].cat.categories), *shape)
+        return self._count(self._lazy(df, keys), keys, shape)
+
+    def backlog_cells(self, df):
+        keys = ['Item Class', 'Delay', 'SECE STATUS']
+        shape = tuple(len(df[key].cat.categories) for key in keys)
+        lazy = self._lazy(df, [*keys, 'is_backlog']).filter(self.pl.col('is_backlog'))
+        return self._count(lazy, keys, shape)
+
+    def item_class_month_counts(self, df):
+        keys = ['Item Class', 'PMonth_Num', 'is_done']
+        shape = (len(df['Item Class'].cat.categories), N_MONTHS, 2)
+        return self._count(self._lazy(df, keys), keys, shape)
+
+
+BACKENDS = {
+    'pandas': PandasBackend,
+    'polars': PolarsBackend,
+}
+
+
+def get_backend(backend=None):
+    """Backend instance for a name, DASH_BACKEND when None; instances are returned as is"""
+    if backend is None:
+        backend = DEFAULT_BACKEND
+    if not isinstance(backend, str):
+        return backend
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown compute backend {backend!r}; expected one of {sorted(BACKENDS)}")
+    return BACKENDS[backend]()
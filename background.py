@@ -0,0 +1,97 @@
+"""Workbook loading on a worker thread, so the page can show progress meanwhile.
+
+A ParseJob runs DataProcessor.load_inspection_data on a daemon thread and
+publishes the rows read and provisional KPI counts as the sheet streams in.
+Each session keeps at most one job; asking for a different workbook or site
+cancels the running one. A finished job leases the parsed snapshot, keeping
+it mapped for as long as the session holds the job.
+"""
+import contextvars
+import threading
+
+from cache import file_fingerprint, frame_fingerprint, parse_cache, read_file_bytes
+from ingest import ParseCancelled
+
+SESSION_KEY = 'parse_job'
+
+
+class ParseJob:
+    def __init__(self, processor, data, site, key):
+        self.key = key
+        self.site = site
+        self.rows_read = 0
+        self.total_rows = None
+        # Provisional count cube summed over the chunks read so far
+        self.counts = None
+        self.result = None
+        self.error = None
+        self.lease = None
+        self._cancel = threading.Event()
+        self._processor = processor
+        # Run in a copy of the caller's context so the parse stages land in its diagnostics run
+        self._thread = threading.Thread(
+            target=contextvars.copy_context().run, args=(self._run, data), name=f'parse-{site}', daemon=True)
+        self._thread.start()
+
+    def _run(self, data):
+        try:
+            self.result = self._processor.load_inspection_data(
+                data, self.site, progress=self._progress, cancel=self._cancel)
+            self.lease = parse_cache.lease(frame_fingerprint(self.result))
+        except ParseCancelled:
+            pass
+        except Exception as e:
+            self.error = e
+
+    def _progress(self, rows_read, total_rows, chunk):
+        if len(chunk):
+            counts = self._processor.chunk_counts(chunk)
+            self.counts = counts if self.counts is None else self.counts + counts
+        self.total_rows = total_rows
+        self.rows_read = rows_read
+
+    @property
+    def done(self):
+        return not self._thread.is_alive()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def fraction(self):
+        """Share of the expected rows read, or None when the sheet size is unknown"""
+        if not self.total_rows:
+            return None
+        return min(self.rows_read / self.total_rows, 1.0)
+
+    def wait(self, timeout=None):
+        """Block up to timeout seconds; True once the job has finished"""
+        self._thread.join(timeout)
+        return self.done
+
+    def cancel(self):
+        """Stop parsing and give up the snapshot lease"""
+        self._cancel.set()
+        if self.lease is not None:
+            self.lease.release()
+
+
+def parse_job_for(session_state, processor, uploaded_file, site):
+    """The session's job for this workbook and site, starting it (and cancelling any other) if needed"""
+    data = read_file_bytes(uploaded_file)
+    key = (site, file_fingerprint(data))
+    job = session_state.get(SESSION_KEY)
+    if job is not None and job.key == key and not job.cancelled:
+        return job
+    if job is not None:
+        job.cancel()
+    job = ParseJob(processor, data, site, key)
+    session_state[SESSION_KEY] = job
+    return job
+
+
+def cancel_parse_job(session_state):
+    job = session_state.pop(SESSION_KEY, None)
+    if job is not None:
+        job.cancel()
@@ -0,0 +1,97 @@
+import numpy as np
+
+from cache import LRUCache
+
+KEY_COLUMNS = ['Site', 'Delay', 'Item Class', 'SECE STATUS', 'Unit name']
+DETAIL_COLUMNS = ['Site', 'Item Class', 'Unit name', 'Scope', 'SECE STATUS', 'Delay']
+
+# Indexes of recently loaded frames, keyed by frame fingerprint
+backlog_indexes = LRUCache(max_entries=16)
+
+
+def _group_positions(values):
+    """Map each category to the ascending positions of the rows holding it"""
+    codes = values.cat.codes.to_numpy()
+    order = np.argsort(codes, kind='stable')
+    counts = np.bincount(codes + 1, minlength=len(values.cat.categories) + 1)
+    # Group 0 collects the missing values (code -1)
+    groups = np.split(order, np.cumsum(counts)[:-1])
+    return {
+        category: groups[i + 1]
+        for i, category in enumerate(values.cat.categories)
+        if counts[i + 1]
+    }
+
+
+class BacklogIndex:
+    """Backlog rows of one inspection frame with their positions grouped by key label.
+
+    Built once per loaded frame, so drill-down queries intersect small position
+    arrays instead of scanning and boolean-filtering the whole frame.
+    """
+
+    def __init__(self, df):
+        positions = np.flatnonzero(df['is_backlog'].to_numpy())
+        self.rows = df.iloc[positions][[c for c in DETAIL_COLUMNS if c in df.columns]]
+        self.groups = {
+            column: _group_positions(self.rows[column])
+            for column in KEY_COLUMNS if column in self.rows.columns
+        }
+
+    def __len__(self):
+        return len(self.rows)
+
+    def labels(self, column):
+        """Labels of ``column`` that have at least one backlog item, in category order"""
+        return list(self.groups[column])
+
+    def query(self, filters=None):
+        """Positions into ``rows`` matching every filter.
+
+        ``filters`` maps key columns to a label or a list of labels; a row
+        matches a column when it holds any of its labels. Empty filters match
+        everything.
+        """
+        positions = np.arange(len(self.rows))
+        for column, labels in (filters or {}).items():
+            if column not in self.groups:
+                raise ValueError(f"Backlog index has no key column {column!r}")
+            if labels is None or (not isinstance(labels, str) and len(labels) == 0):
+                continue
+            if isinstance(labels, str):
+                labels = [labels]
+            groups = self.groups[column]
+            matches = np.sort(np.concatenate(
+                [groups.get(label, np.empty(0, dtype=np.intp)) for label in labels]))
+            positions = np.intersect1d(positions, matches, assume_unique=True)
+        return positions
+
+    def select(self, filters=None):
+        return self.rows.iloc[self.query(filters)]
+
+    def sorted_positions(self, filters=None, sort_by=None, ascending=True):
+        """query(filters), optionally ordered by a column's category order"""
+        positions = self.query(filters)
+        if sort_by is not None:
+            codes = self.rows[sort_by].cat.codes.to_numpy()[positions]
+            positions = positions[np.argsort(codes if ascending else -codes, kind='stable')]
+        return positions
+
+    def page(self, filters=None, page=1, page_size=100, sort_by=None, ascending=True):
+        """One page of the matching rows, optionally sorted by a column's category order.
+
+        Returns a dict with the page's ``rows``, the ``total`` number of matches,
+        and the clamped ``page`` number out of ``pages``.
+        """
+        positions = self.sorted_positions(filters, sort_by, ascending)
+
+        total = len(positions)
+        pages = max(1, -(-total // page_size))
+        page = min(max(int(page), 1), pages)
+        start = (page - 1) * page_size
+        return {
+            'rows': self.rows.iloc[positions[start:start + page_size]],
+            'total': total,
+            'page': page,
+            'pages': pages
+        }
@@ -0,0 +1,179 @@
+"""Build the dashboard's KPI pack for every workbook in a directory without the UI.
+
+    python batch_report.py exports/ reports/ --workers 4
+
+Each workbook gets an output folder holding results.json (analyze_data
+results), data.parquet (the loaded inspection frame), backlog_summary.parquet
+(the Backlog Summary table) and the dashboard charts as static HTML. A
+summary.json and summary.parquet with one KPI row per workbook are written at
+the top of the output directory. The site is taken from the file name (GIR,
+DAL, PAZ or CLV) unless --site is given. Results are as of --as-of, today by
+default. Workbooks whose content and reference date have not changed since the
+last run are skipped unless --force is set. Parse snapshots go to a scratch
+directory removed at the end, unless DASH_CACHE_DIR is set, so a batch never
+fills or evicts the dashboard's cache.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+# Set before the app modules are imported; pool workers inherit it
+SCRATCH_DIR = None
+if __name__ == '__main__' and 'DASH_CACHE_DIR' not in os.environ:
+    SCRATCH_DIR = os.environ['DASH_CACHE_DIR'] = tempfile.mkdtemp(prefix='dash-batch-')
+
+import pandas as pd
+
+from cache import file_fingerprint, read_file_bytes
+from data_processing import DataProcessor, reference_date
+from streamlit_app import (SITES, build_backlog_table, create_backlog_item_class_chart,
+                           create_completion_bar_chart, create_monthly_performance_chart)
+
+
+def infer_site(path, default=None):
+    name = os.path.basename(path).upper()
+    for site in SITES:
+        if re.search(rf'(?<![A-Z]){site}(?![A-Z])', name):
+            return site
+    return default
+
+
+def results_to_json(results):
+    """analyze_data results with the item class pivot flattened to JSON-friendly records"""
+    item_class_analysis = results['item_class_analysis']
+    pivot_records = [
+        {'Item Class': item_class, 'Delay': delay, 'SECE STATUS': sece, 'count': int(count)}
+        for (delay, sece), column in item_class_analysis['pivot_table'].items()
+        for item_class, count in column.items()
+        if not pd.isna(count)
+    ]
+    return {
+        **results,
+        'item_class_analysis': {**item_class_analysis, 'pivot_table': pivot_records}
+    }
+
+
+def process_workbook(path, output_dir, site, include_plotlyjs='cdn', force=False, as_of=None):
+    """Load, analyse as of a reference date and render one workbook; returns its KPI summary row"""
+    as_of = reference_date(as_of)
+    data = read_file_bytes(path)
+    fingerprint = file_fingerprint(data)
+    results_path = os.path.join(output_dir, 'results.json')
+    if not force and os.path.exists(results_path):
+        with open(results_path) as f:
+            previous = json.load(f)
+        source = previous.get('source', {})
+        if source.get('sha256') == fingerprint and source.get('as_of') == as_of.isoformat():
+            return previous['summary']
+
+    processor = DataProcessor()
+    df = processor.load_inspection_data(data, site)
+    results = processor.analyze_data(df, as_of=as_of)
+    item_class_matrix = processor.get_item_class_month_matrix(df)
+    df_backlog = build_backlog_table(results['item_class_analysis'])
+
+    os.makedirs(output_dir, exist_ok=True)
+    df.to_parquet(os.path.join(output_dir, 'data.parquet'))
+    df_backlog.set_axis(
+        [' / '.join(map(str, column)) if isinstance(column, tuple) else column for column in df_backlog.columns],
+        axis=1
+    ).to_parquet(os.path.join(output_dir, 'backlog_summary.parquet'))
+
+    charts = {
+        'monthly_performance': create_monthly_performance_chart(
+            results['performance_metrics']['monthly_performance']),
+        'sce_monthly_performance': create_monthly_performance_chart(
+            results['sce_metrics']['monthly_performance'], title="SCE Monthly Performance Overview"),
+        'completed_by_item_class': create_completion_bar_chart(item_class_matrix),
+        'backlog_by_item_class': create_backlog_item_class_chart(df_backlog),
+    }
+    for name, fig in charts.items():
+        fig.write_html(os.path.join(output_dir, f'{name}.html'), include_plotlyjs=include_plotlyjs)
+
+    completion = results['performance_metrics']['completion_metrics']
+    summary = {
+        'workbook': os.path.basename(path),
+        'site': site,
+        'as_of': as_of.isoformat(),
+        'rows': len(df),
+        'total_backlog': results['backlog_summary']['total_backlog'],
+        'sce_backlog_rate': results['backlog_summary']['sece_metrics']['sece_percentage'],
+        'completion_rate': completion['completion_rate'],
+        'on_time_rate': completion['on_time_rate'],
+        'ytd_percentage': completion['ytd_percentage'],
+    }
+    with open(results_path, 'w') as f:
+        json.dump({
+            'source': {'path': os.path.abspath(path), 'sha256': fingerprint, 'as_of': as_of.isoformat()},
+            'summary': summary,
+            'results': results_to_json(results)
+        }, f, indent=2)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input_dir')
+    parser.add_argument('output_dir')
+    parser.add_argument('--pattern', default='*.xlsm', help='glob for workbooks, searched recursively')
+    parser.add_argument('--site', choices=SITES, help='site for workbooks whose name does not include one')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--embed-plotlyjs', action='store_true',
+                        help='embed plotly.js in each chart instead of loading it from the CDN')
+    parser.add_argument('--as-of', type=date.fromisoformat, default=date.today(),
+                        help='reference date (YYYY-MM-DD) for backlog carry-over and YTD, default today')
+    parser.add_argument('--force', action='store_true', help='reprocess workbooks that have not changed')
+    args = parser.parse_args(argv)
+
+    paths = sorted(glob.glob(os.path.join(args.input_dir, '**', args.pattern), recursive=True))
+    if not paths:
+        print(f"No workbooks matching {args.pattern} in {args.input_dir}")
+        return 1
+
+    include_plotlyjs = True if args.embed_plotlyjs else 'cdn'
+    summaries = []
+    failures = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {}
+        for path in paths:
+            site = infer_site(path, args.site)
+            if site is None:
+                print(f"Skipping {path}: no site in file name, pass --site")
+                failures += 1
+                continue
+            relative = os.path.splitext(os.path.relpath(path, args.input_dir))[0]
+            output_dir = os.path.join(args.output_dir, relative)
+            futures[pool.submit(process_workbook, path, output_dir, site, include_plotlyjs,
+                                args.force, args.as_of)] = path
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                summaries.append(future.result())
+                print(f"Processed {path}")
+            except Exception as e:
+                print(f"Failed {path}: {e}")
+                failures += 1
+
+    if summaries:
+        os.makedirs(args.output_dir, exist_ok=True)
+        summary = pd.DataFrame(summaries).sort_values(['site', 'workbook'])
+        summary.to_parquet(os.path.join(args.output_dir, 'summary.parquet'), index=False)
+        with open(os.path.join(args.output_dir, 'summary.json'), 'w') as f:
+            json.dump(summary.to_dict(orient='records'), f, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    try:
+        status = main()
+    finally:
+        if SCRATCH_DIR is not None:
+            shutil.rmtree(SCRATCH_DIR, ignore_errors=True)
+    sys.exit(status)
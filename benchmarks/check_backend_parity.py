@@ -0,0 +1,107 @@
+"""Check that every compute backend gives bit-identical results to the pandas backend.
+
+    python benchmarks/check_backend_parity.py                 # 1k and 10k rows
+    python benchmarks/check_backend_parity.py --sizes 100k --backends polars
+
+Each synthetic workbook is loaded once, then analysed by every backend: the
+count arrays, analyze_data results, the item class month matrix and the
+monthly item class table for every month are compared with the pandas
+backend's, on the full frame, on a slice and on an empty frame, and the per
+site counts on a two-site frame. Results are compared by their pickled bytes,
+so NaN cells and dtypes must match too. Timings of the counting pass are
+printed for information. Exits with status 1 on any difference. The same
+comparisons run on a small workbook in tests/test_backends.py.
+"""
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DASH_CACHE_DIR', tempfile.mkdtemp(prefix='dash-parity-'))
+
+import numpy as np
+
+from backends import BACKENDS
+from benchmarks.generate_workbook import SIZES, generate_workbook, workbook_path
+from cache import analysis_cache
+from data_processing import DataProcessor
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def outputs(processor, df):
+    """Everything the analyses derive from the backend's counts"""
+    analysis_cache.clear()
+    matrix = processor.get_item_class_month_matrix(df)
+    return {
+        'performance_counts': processor._performance_counts(df),
+        'backlog_pivot_counts': processor._backlog_pivot_counts(df),
+        'analyze_data': processor.analyze_data(df),
+        'item_class_month_matrix': matrix,
+        'monthly_item_class_performance': [
+            processor.get_monthly_item_class_performance(df, month, matrix=matrix) for month in range(1, 13)
+        ],
+    }
+
+
+def differences(expected, actual):
+    return [name for name in expected
+            if pickle.dumps(expected[name]) != pickle.dumps(actual[name])]
+
+
+def load_frames(rows):
+    path = workbook_path(DATA_DIR, rows)
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        print(f'generating {path}')
+        generate_workbook(path, rows)
+    processor = DataProcessor('pandas')
+    df = processor.load_inspection_data(path, 'GIR')
+    sites = processor.load_sites({'GIR': path, 'DAL': path})
+    return {'full': df, 'slice': df.iloc[len(df) // 3:], 'empty': df.iloc[:0]}, sites
+
+
+def check_size(size, backends):
+    frames, sites = load_frames(SIZES[size])
+    reference = DataProcessor('pandas')
+    failures = []
+    for name in backends:
+        processor = DataProcessor(name)
+        for label, df in frames.items():
+            for output in differences(outputs(reference, df), outputs(processor, df)):
+                failures.append(f'{size} {name} {label}: {output} differs')
+        expected = reference._performance_counts(sites, by='Site')
+        if not np.array_equal(expected, processor._performance_counts(sites, by='Site')):
+            failures.append(f'{size} {name} sites: per site counts differ')
+
+        start = time.perf_counter()
+        processor._performance_counts(frames['full'])
+        processor._backlog_pivot_counts(frames['full'])
+        processor.get_item_class_month_matrix(frames['full'])
+        print(f'  {name:<10} counting pass {time.perf_counter() - start:.4f} s')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['1k', '10k'])
+    parser.add_argument('--backends', nargs='+', choices=list(BACKENDS), default=list(BACKENDS))
+    args = parser.parse_args()
+
+    failures = []
+    for size in args.sizes:
+        print(f'{size} rows')
+        failures += check_size(size, args.backends)
+    for failure in failures:
+        print(f'MISMATCH {failure}')
+    if not failures:
+        print('all backends match')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
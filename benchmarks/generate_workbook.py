@@ -0,0 +1,95 @@
+"""Generate synthetic inspection programme workbooks for benchmarking.
+
+The "Data Base" sheet has four title rows, the header on row 5 and the ten
+columns load_inspection_data reads, interleaved with unrelated columns the way
+site workbooks are laid out. A few extra sheets mimic the rest of the file.
+
+    python benchmarks/generate_workbook.py --rows 1000 10000 --out benchmarks/data
+"""
+import argparse
+import os
+
+import numpy as np
+from openpyxl import Workbook
+
+SIZES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+HEADER = ['N°', 'Tag', 'Item Class', 'Equipment Description', 'Unit name', 'Scope', 'SECE STATUS',
+          'Backlog?', 'Delay', 'Last Insp Date', 'Year', 'PMonth Insp', 'CMonth Insp', 'Job Done',
+          'Comments']
+
+ITEM_CLASSES = ['Pressure Vessel', 'Piping', 'PSV', 'Heat Exchanger', 'Storage Tank', 'Pipeline',
+                'Structure', 'Lifting Equipment', 'Rotating Equipment', 'Fired Heater', 'Flare',
+                'Electrical']
+UNITS = [f'U{n}' for n in range(100, 1000, 50)]
+SCOPES = ['External visual', 'Internal visual', 'UT thickness', 'CUI survey', 'Function test',
+          'Overhaul', 'NDT weld survey', 'Load test']
+DELAYS = ['< 6 Months', '6 Months < x <1 Yrs', '1 Yrs < x <2 Yrs', '2 Yrs < x <3 Yrs', '> 3 Yrs']
+
+
+def workbook_path(directory, rows, extension='xlsm'):
+    return os.path.join(directory, f'inspection_{rows}.{extension}')
+
+
+def generate_workbook(path, rows, seed=0):
+    """Write a workbook with ``rows`` inspection rows to ``path`` in constant memory"""
+    rng = np.random.default_rng(seed)
+    item_class = rng.choice(ITEM_CLASSES, rows)
+    unit = rng.choice(UNITS, rows)
+    scope = rng.choice(SCOPES, rows)
+    sece = rng.choice(['SECE', 'Non-SECE', None], rows, p=[0.35, 0.6, 0.05])
+    pmonth = rng.integers(1, 13, rows)
+    done = rng.random(rows) < 0.55
+    cmonth = np.clip(pmonth + rng.integers(-1, 3, rows), 1, 12)
+    backlog = ~done & (rng.random(rows) < 0.6)
+    delay = rng.choice(DELAYS, rows, p=[0.35, 0.25, 0.2, 0.12, 0.08])
+    no_plan = rng.random(rows) < 0.03
+
+    wb = Workbook(write_only=True)
+    summary = wb.create_sheet('Dashboard')
+    summary.append(['Inspection programme'])
+    ws = wb.create_sheet('Data Base')
+    ws.append(['INSPECTION PROGRAMME'])
+    ws.append(['Synthetic benchmark workbook'])
+    ws.append([])
+    ws.append([f'{rows} items'])
+    ws.append(HEADER)
+    for i in range(rows):
+        ws.append([
+            i + 1,
+            f'{unit[i]}-{item_class[i][:3].upper()}-{i:06d}',
+            item_class[i],
+            f'{item_class[i]} {i}',
+            unit[i],
+            scope[i],
+            sece[i],
+            'Yes' if backlog[i] else 'No',
+            delay[i] if backlog[i] else None,
+            None,
+            2025,
+            None if no_plan[i] else int(pmonth[i]),
+            int(cmonth[i]) if done[i] else None,
+            'Compl' if done[i] else 'Not Compl',
+            None
+        ])
+    lists = wb.create_sheet('Lists')
+    for value in ITEM_CLASSES:
+        lists.append([value])
+    wb.save(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[SIZES['1k'], SIZES['10k']])
+    parser.add_argument('--out', default=os.path.join(os.path.dirname(__file__), 'data'))
+    parser.add_argument('--extension', choices=['xlsm', 'xlsx'], default='xlsm')
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    for rows in args.rows:
+        print(generate_workbook(workbook_path(args.out, rows, args.extension), rows))
+
+
+if __name__ == '__main__':
+    main()
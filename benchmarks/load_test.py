@@ -0,0 +1,196 @@
+"""Load-test the dashboard with many concurrent headless sessions.
+
+    python benchmarks/load_test.py --sessions 16                 # 10k-row workbooks
+    python benchmarks/load_test.py --sessions 32 --distinct 4 --parse-workers 2 --parse-queue 8
+
+Each session runs streamlit_app.main() in its own AppTest, in one process as
+sessions share a Streamlit server. All sessions upload at the same moment,
+session i uploading synthetic workbook i % --distinct, and rerun until the
+analysis tabs appear, the server turns them away as busy or --timeout passes.
+AppTest swaps process-wide runtime state on every run, so script runs are
+serialised; workbook parsing, where concurrent sessions compete, still runs
+concurrently on the sessions' parse job threads.
+The latency percentiles from upload to dashboard, the outcome counts, the
+admission control counters and the peak RSS of the process are printed.
+Parse and snapshot caches start empty. Exits with status 1 when a session
+fails or times out.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+APP = os.path.join(ROOT, 'streamlit_app.py')
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+PERCENTILES = [50, 90, 95, 99]
+
+# AppTest.run installs a process-wide mock runtime, so only one may run at a time
+script_lock = threading.Lock()
+
+
+def rss_mb():
+    """Resident set size of this process, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class RSSSampler(threading.Thread):
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_mb = rss_mb()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            current = rss_mb()
+            if current is not None:
+                self.peak_mb = max(self.peak_mb or 0, current)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.peak_mb
+
+
+def workbooks(rows, distinct):
+    """Paths of ``distinct`` synthetic workbooks with different content"""
+    from benchmarks.generate_workbook import generate_workbook, workbook_path
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    paths = []
+    for seed in range(distinct):
+        path = workbook_path(DATA_DIR, rows)
+        if seed:
+            path = path.replace('.xlsm', f'_seed{seed}.xlsm')
+        if not os.path.exists(path):
+            print(f'generating {path}')
+            generate_workbook(path, rows, seed=seed)
+        paths.append(path)
+    return paths
+
+
+def run_session(path, start_barrier, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=timeout)
+
+    def rerun():
+        with script_lock:
+            at.run()
+
+    rerun()
+    with open(path, 'rb') as f:
+        upload = (os.path.basename(path), f.read(), 'application/vnd.ms-excel.sheet.macroEnabled.12')
+    start_barrier.wait()
+
+    start = time.perf_counter()
+    at.file_uploader[0].set_value(upload)
+    rerun()
+    while True:
+        elapsed = time.perf_counter() - start
+        if at.exception:
+            return {'status': 'error', 'seconds': elapsed, 'detail': at.exception[0].message}
+        if any(warning.value.startswith('The server is busy') for warning in at.warning):
+            return {'status': 'rejected', 'seconds': elapsed}
+        if len(at.tabs):
+            return {'status': 'ok', 'seconds': elapsed}
+        if elapsed > timeout:
+            return {'status': 'timeout', 'seconds': elapsed}
+        time.sleep(0.1)
+        rerun()
+
+
+def percentiles(values):
+    if len(values) < 2:
+        return {f'p{p}': round(values[0], 3) if values else None for p in PERCENTILES}
+    cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return {f'p{p}': round(cuts[p - 1], 3) for p in PERCENTILES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--distinct', type=int, default=None,
+                        help='number of different workbooks uploaded, default one per session')
+    parser.add_argument('--parse-workers', type=int, help='DASH_PARSE_WORKERS for this run')
+    parser.add_argument('--parse-queue', type=int, help='DASH_PARSE_QUEUE for this run')
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--output', help='also write the measurements to this JSON file')
+    args = parser.parse_args()
+
+    # Set before the app modules are imported by the first session
+    scratch = tempfile.mkdtemp(prefix='dash-load-')
+    os.environ['DASH_CACHE_DIR'] = scratch
+    os.environ['DASH_HISTORY_DB'] = os.path.join(scratch, 'history.sqlite')
+    if args.parse_workers is not None:
+        os.environ['DASH_PARSE_WORKERS'] = str(args.parse_workers)
+    if args.parse_queue is not None:
+        os.environ['DASH_PARSE_QUEUE'] = str(args.parse_queue)
+
+    paths = workbooks(args.rows, args.distinct or args.sessions)
+    baseline_mb = rss_mb()
+    sampler = RSSSampler()
+    sampler.start()
+
+    start_barrier = threading.Barrier(args.sessions)
+    outcomes = [None] * args.sessions
+
+    def session(i):
+        try:
+            outcomes[i] = run_session(paths[i % len(paths)], start_barrier, args.timeout)
+        except Exception as e:
+            start_barrier.abort()
+            outcomes[i] = {'status': 'error', 'seconds': None, 'detail': repr(e)}
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(args.sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    peak_mb = sampler.stop()
+
+    from admission import parse_admission
+
+    statuses = [outcome['status'] for outcome in outcomes]
+    latencies = [outcome['seconds'] for outcome in outcomes if outcome['status'] == 'ok']
+    report = {
+        'sessions': args.sessions,
+        'rows': args.rows,
+        'distinct_workbooks': len(paths),
+        'parse_workers': parse_admission.max_workers,
+        'parse_queue': parse_admission.max_queued,
+        'outcomes': {status: statuses.count(status) for status in sorted(set(statuses))},
+        'latency_seconds': {**percentiles(latencies), 'max': round(max(latencies), 3) if latencies else None},
+        'wall_seconds': round(wall, 3),
+        'baseline_rss_mb': round(baseline_mb, 1) if baseline_mb is not None else None,
+        'peak_rss_mb': round(peak_mb, 1) if peak_mb is not None else None,
+        'admission': parse_admission.stats(),
+    }
+    for name, value in report.items():
+        print(f'  {name:<20} {value}')
+    for outcome in outcomes:
+        if outcome['status'] == 'error':
+            print(f"ERROR {outcome['detail']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 1 if any(status in ('error', 'timeout') for status in statuses) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""Time and memory-profile the load -> analyze -> chart pipeline on synthetic workbooks.
+
+    python benchmarks/run_benchmarks.py                       # 1k and 10k rows vs baselines.json
+    python benchmarks/run_benchmarks.py --sizes 1k 10k 100k 1m
+    python benchmarks/run_benchmarks.py --update-baselines
+
+Workbooks are generated into benchmarks/data on first use. Each stage is timed
+``--repeat`` times with the parse, analysis and backlog index caches cleared
+(median reported), then run once more under tracemalloc for its peak
+allocation. The run exits with status 1 when a stage is slower or allocates
+more than ``--tolerance`` times its stored baseline. Baselines cover every
+size; they are machine specific, so refresh them with --update-baselines when
+moving to new hardware, and for the sizes a change affects in the commit that
+makes it.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Keep benchmark snapshots out of the dashboard's cache directory
+os.environ.setdefault('DASH_CACHE_DIR', tempfile.mkdtemp(prefix='dash-bench-'))
+
+import pandas as pd
+
+from backlog_index import backlog_indexes
+from benchmarks.generate_workbook import SIZES, generate_workbook, workbook_path
+from cache import analysis_cache, figure_cache, parse_cache
+from data_processing import DataProcessor
+from streamlit_app import (build_backlog_table, create_backlog_item_class_chart,
+                           create_completion_bar_chart, create_monthly_performance_chart)
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+# Differences below these floors are treated as noise
+MIN_SECONDS_DELTA = 0.005
+MIN_PEAK_MB_DELTA = 1.0
+
+
+def _clear_caches():
+    parse_cache.clear_memory()
+    shutil.rmtree(parse_cache.snapshot_dir, ignore_errors=True)
+    analysis_cache.clear()
+
+
+def pipeline_stages(processor, path):
+    """Ordered (name, callable) pairs; later stages use what earlier ones stored in ctx"""
+    ctx = {}
+
+    def load():
+        _clear_caches()
+        ctx['df'] = processor.load_inspection_data(path, 'GIR')
+
+    def load_snapshot():
+        parse_cache.clear_memory()
+        processor.load_inspection_data(path, 'GIR')
+
+    def analyze():
+        analysis_cache.clear()
+        ctx['results'] = processor.analyze_data(ctx['df'])
+
+    def item_class_matrix():
+        ctx['matrix'] = processor.get_item_class_month_matrix(ctx['df'])
+
+    def monthly_item_class():
+        processor.get_monthly_item_class_performance(ctx['df'], 6)
+
+    def backlog_details():
+        backlog_indexes.clear()
+        processor.get_backlog_details_by_delay(ctx['df'], '> 3 Yrs')
+
+    def monthly_chart():
+        figure_cache.clear()
+        create_monthly_performance_chart(ctx['results']['performance_metrics']['monthly_performance']).to_json()
+
+    def completion_chart():
+        figure_cache.clear()
+        create_completion_bar_chart(ctx['matrix']).to_json()
+
+    def backlog_chart():
+        figure_cache.clear()
+        df_backlog = build_backlog_table(ctx['results']['item_class_analysis'])
+        create_backlog_item_class_chart(df_backlog).to_json()
+
+    return [
+        ('load_inspection_data', load),
+        ('load_inspection_data:snapshot', load_snapshot),
+        ('analyze_data', analyze),
+        ('get_item_class_month_matrix', item_class_matrix),
+        ('get_monthly_item_class_performance', monthly_item_class),
+        ('get_backlog_details_by_delay', backlog_details),
+        ('create_monthly_performance_chart', monthly_chart),
+        ('create_completion_bar_chart', completion_chart),
+        ('create_backlog_item_class_chart', backlog_chart),
+    ]
+
+
+def run_size(rows, repeat):
+    path = workbook_path(DATA_DIR, rows)
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        print(f'generating {path}')
+        generate_workbook(path, rows)
+
+    processor = DataProcessor()
+    results = {}
+    for name, stage in pipeline_stages(processor, path):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            stage()
+            timings.append(time.perf_counter() - start)
+        tracemalloc.start()
+        stage()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {
+            'seconds': round(statistics.median(timings), 6),
+            'peak_mb': round(peak / 2**20, 3)
+        }
+        print(f"  {name:<40} {results[name]['seconds']:>10.4f} s {results[name]['peak_mb']:>10.2f} MB")
+    return results
+
+
+def find_regressions(results, baselines, tolerance):
+    regressions = []
+    for size, stages in results.items():
+        for name, measured in stages.items():
+            base = baselines.get(size, {}).get(name)
+            if base is None:
+                continue
+            if (measured['seconds'] > base['seconds'] * tolerance
+                    and measured['seconds'] - base['seconds'] > MIN_SECONDS_DELTA):
+                regressions.append(f"{size} {name}: {measured['seconds']:.4f} s vs baseline {base['seconds']:.4f} s")
+            if (measured['peak_mb'] > base['peak_mb'] * tolerance
+                    and measured['peak_mb'] - base['peak_mb'] > MIN_PEAK_MB_DELTA):
+                regressions.append(f"{size} {name}: {measured['peak_mb']:.2f} MB vs baseline {base['peak_mb']:.2f} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['1k', '10k'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tolerance', type=float, default=1.5)
+    parser.add_argument('--baselines', default=BASELINES)
+    parser.add_argument('--update-baselines', action='store_true')
+    parser.add_argument('--output', help='also write the measurements to this JSON file')
+    args = parser.parse_args()
+
+    results = {}
+    for size in args.sizes:
+        print(f'{size} rows')
+        results[size] = run_size(SIZES[size], args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as f:
+            baselines = json.load(f)
+
+    if args.update_baselines:
+        baselines.update(results)
+        baselines['_environment'] = {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'machine': platform.machine()
+        }
+        with open(args.baselines, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'baselines written to {args.baselines}')
+        return 0
+
+    regressions = find_regressions(results, baselines, args.tolerance)
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
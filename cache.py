@@ -0,0 +1,186 @@
+import hashlib
+import os
+import pickle
+import threading
+import weakref
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+
+from snapshot_store import SnapshotStore
+
+CACHE_DIR = os.environ.get('DASH_CACHE_DIR', os.path.expanduser('~/.cache/dash'))
+ANALYSIS_CACHE_MB = float(os.environ.get('DASH_ANALYSIS_CACHE_MB', '64'))
+SNAPSHOT_CACHE_MB = float(os.environ.get('DASH_SNAPSHOT_CACHE_MB', '2048'))
+
+
+def pickled_size(value):
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU mapping shared by all sessions of the process.
+
+    Entries are evicted least recently used first once there are more than
+    ``max_entries`` of them or, when ``max_bytes`` is set, once the sizes reported
+    by ``sizeof`` add up to more than the budget.
+    """
+
+    def __init__(self, max_entries=16, max_bytes=None, sizeof=pickled_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.total_bytes = 0
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def _remove(self, key):
+        self.total_bytes -= self._sizes.pop(key, 0)
+        return self._data.pop(key)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._data[key] = value
+            self._sizes[key] = size
+            self.total_bytes += size
+            while self._data and (
+                    len(self._data) > self.max_entries
+                    or (self.max_bytes is not None and self.total_bytes > self.max_bytes)):
+                self._remove(next(iter(self._data)))
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            return self._remove(key)
+
+    def evict_matching(self, predicate):
+        """Drop every entry whose key satisfies ``predicate``"""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.total_bytes = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+def read_file_bytes(uploaded_file):
+    """Return the raw bytes of an uploaded file, a path or a file-like object"""
+    if isinstance(uploaded_file, (bytes, bytearray)):
+        return bytes(uploaded_file)
+    if isinstance(uploaded_file, (str, os.PathLike)):
+        with open(uploaded_file, 'rb') as f:
+            return f.read()
+    if hasattr(uploaded_file, 'getvalue'):
+        return uploaded_file.getvalue()
+    position = uploaded_file.tell()
+    data = uploaded_file.read()
+    uploaded_file.seek(position)
+    return data
+
+
+def file_fingerprint(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+_known_fingerprints = {}
+
+
+def remember_fingerprint(df, fingerprint):
+    """Record the fingerprint of a frame that is not modified after loading"""
+    frame_id = id(df)
+    _known_fingerprints[frame_id] = (
+        weakref.ref(df, lambda _: _known_fingerprints.pop(frame_id, None)), fingerprint)
+
+
+def frame_fingerprint(df):
+    """Content hash of a DataFrame, reusing the fingerprint recorded at load time"""
+    known = _known_fingerprints.get(id(df))
+    if known is not None and known[0]() is df:
+        return known[1]
+    h = hashlib.sha256()
+    h.update('|'.join(map(str, df.columns)).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+class ParseCache:
+    """Cleaned inspection frames keyed on workbook content, as shared memory-mapped snapshots.
+
+    Frames are stored through a SnapshotStore, so every session gets the same
+    read-only views on one mapped file. Frames that cannot be written to disk
+    are kept in an in-memory LRU instead.
+    """
+
+    def __init__(self, snapshot_dir=CACHE_DIR, max_entries=8, max_bytes=None):
+        self.store = SnapshotStore(os.path.join(snapshot_dir, 'snapshots'), max_entries, max_bytes)
+        self.snapshot_dir = self.store.directory
+        self.memory = LRUCache(max_entries)
+
+    def key(self, data, selected_site, columns, version):
+        h = hashlib.sha256()
+        h.update(file_fingerprint(data).encode())
+        h.update(f"|{version}|{selected_site}|{'|'.join(columns)}".encode())
+        return h.hexdigest()
+
+    def get(self, key):
+        df = self.memory.get(key)
+        if df is None:
+            df = self.store.get(key)
+        # Inspection frames are read-only, so the cached object is shared
+        return df
+
+    def put(self, key, df):
+        """Cache df and return the frame to use in its place, a mapped snapshot when possible"""
+        try:
+            return self.store.put(key, df)
+        except (OSError, ValueError, TypeError, pa.ArrowException) as e:
+            # Snapshots are an optimisation only, keep the parsed frame in memory
+            print(f"Could not write snapshot {self.store.path(key)}: {e}")
+            self.memory.put(key, df)
+            return df
+
+    def lease(self, key):
+        """Hold the mapped snapshot for key until the lease is released; None if it is not on disk"""
+        return self.store.acquire(key)
+
+    def clear_memory(self):
+        """Forget in-memory frames and unleased mappings, so the next get reads the snapshot file"""
+        self.memory.clear()
+        self.store.unmap_unused()
+
+    def invalidate(self, key):
+        self.memory.pop(key)
+        self.store.invalidate(key)
+
+
+parse_cache = ParseCache(max_bytes=int(SNAPSHOT_CACHE_MB * 1024 * 1024))
+analysis_cache = LRUCache(max_entries=256, max_bytes=int(ANALYSIS_CACHE_MB * 1024 * 1024))
+figure_cache = LRUCache(max_entries=64)
+# Workbook layouts found by ingest.read_data_base, keyed on file fingerprint, sheet and columns
+structure_cache = LRUCache(max_entries=256)
@@ -1,9 +1,51 @@
+import calendar
+import copy
+import hashlib
+import io
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
 import pandas as pd
-from datetime import datetime
+from datetime import date
+
+from admission import parse_admission
+from backends import get_backend
+from backlog_index import BacklogIndex, backlog_indexes
+from cache import (analysis_cache, file_fingerprint, frame_fingerprint, parse_cache, read_file_bytes,
+                   remember_fingerprint, structure_cache)
+from exports import export_cache, frame_chunks
+from incremental import analysed_snapshots, change_reports, diff_frames
+from ingest import read_data_base
+from instrumentation import instrumented, stage
+from normalise import inspection_rules, normalise
+from schema import INSPECTION_COLUMNS, SCHEMA_VERSION, concat_inspection_frames, to_inspection_frame
+
+# Column titles of the exported monthly performance tables
+MONTHLY_EXPORT_COLUMNS = {
+    'month': 'Month',
+    'total_planned': 'Planned',
+    'backlog_count': 'Backlog',
+    'completed_count': 'Completed',
+    'progress_percentage': 'Progress %'
+}
+
+# Bump whenever the cleaning in load_inspection_data changes so stale snapshots are ignored
+PARSE_VERSION = f"5.{SCHEMA_VERSION}"
+
+
+def reference_date(as_of=None):
+   """as_of as a date, today when None; datetimes are cut to their day so they share its cache entries"""
+   if as_of is None:
+       return date.today()
+   return pd.Timestamp(as_of).date()
 
 
 class DataProcessor:
-   def __init__(self):
+   def __init__(self, backend=None):
+       # Counting backend ('pandas' or 'polars'); defaults to DASH_BACKEND
+       self.backend = get_backend(backend)
        self.month_map = {
            1: 'JAN', 2: 'FEB', 3: 'MAR', 4: 'APR',
            5: 'MAY', 6: 'JUN', 7: 'JUL', 8: 'AUG',
@@ -16,63 +58,289 @@ class DataProcessor:
            '2 Yrs < x <3 Yrs': '#FFC0CB',  # Light pink
            '> 3 Yrs': '#FF6B6B'  # Red
        }
+       # Fill values, canonical labels and number coercions applied by _clean
+       self.cleaning_rules = inspection_rules(list(self.delay_colors.keys()))
        
-   def load_inspection_data(self, uploaded_file, selected_site='GIR'):
-       site_config = {
-           'GIR': {'nrows': 583},
-           'DAL': {'nrows': 833},
-           'PAZ': {'nrows': 861}, 
-           'CLV': {'nrows': 735}
-       }
+   @instrumented()
+   def load_inspection_data(self, uploaded_file, selected_site='GIR', progress=None, cancel=None):
+       """Load the typed inspection frame of a workbook, from the parse cache when possible.
 
-       # Add this before the main df = pd.read_excel()
-       temp_df = pd.read_excel(
-           uploaded_file,
-           sheet_name='Data Base',
-           skiprows=4,
-           nrows=1
-       )
-       print("Available columns:", list(temp_df.columns))
-       
-       df = pd.read_excel(
-           uploaded_file,
-           sheet_name='Data Base',
-           skiprows=4,
-           nrows=site_config[selected_site]['nrows'],
-           usecols=['Item Class', 'Backlog?', 'SECE STATUS', 'Delay', 'Year', 
-                   'Job Done', 'CMonth Insp', 'PMonth Insp', 'Unit name', 'Scope']
-       )
-       
-       df.columns = df.columns.str.strip()
-       df = df.dropna(how='all')
-       df['Backlog?'] = df['Backlog?'].fillna('No')
-       df['SECE STATUS'] = df['SECE STATUS'].fillna('Non-SCE').astype(str).apply(
-           lambda x: 'SCE' if x.upper() == 'SECE' else 'Non-SCE'
-       )
-       df['Year'] = df['Year'].fillna(datetime.now().year)
-       df['Job Done'] = df['Job Done'].fillna('Not Compl')
-       
+       progress and cancel are handed to ingest.read_data_base when the workbook
+       has to be parsed. Parsing goes through admission.parse_admission, which
+       may queue it or raise ParseRejected when the server is busy.
+       """
+       data = read_file_bytes(uploaded_file)
+       cache_key = parse_cache.key(data, selected_site, INSPECTION_COLUMNS, PARSE_VERSION)
+       cached = parse_cache.get(cache_key)
+       if cached is not None:
+           remember_fingerprint(cached, cache_key)
+           return cached
+
+       df = parse_admission.run(
+           cache_key, lambda: self._parse_and_cache(cache_key, data, progress, cancel), cancel)
+       remember_fingerprint(df, cache_key)
        return df
+
+   def _parse_and_cache(self, cache_key, data, progress=None, cancel=None):
+       # An identical parse may have finished while this one waited for a slot
+       cached = parse_cache.get(cache_key)
+       if cached is not None:
+           return cached
+       df = self._parse_inspection_data(data, progress, cancel)
+       # Continue with the memory-mapped snapshot so sessions share one copy
+       return parse_cache.put(cache_key, df)
+
+   @instrumented()
+   def load_sites(self, site_files):
+       """Load several site workbooks into one frame with a categorical Site column.
+
+       site_files maps site code to uploaded file. Workbooks missing from the parse
+       cache are parsed concurrently in the process pool shared by every session,
+       each through admission.parse_admission like load_inspection_data, so this
+       may also queue or raise ParseRejected.
+       """
+       frames = {}
+       pending = {}
+       for site, uploaded_file in site_files.items():
+           data = read_file_bytes(uploaded_file)
+           cache_key = parse_cache.key(data, site, INSPECTION_COLUMNS, PARSE_VERSION)
+           cached = parse_cache.get(cache_key)
+           if cached is not None:
+               frames[site] = (cache_key, cached)
+           else:
+               pending[site] = (cache_key, data)
+
+       if len(pending) > 1:
+           # One thread per workbook waits for its admission slot and the pool's result
+           with ThreadPoolExecutor(max_workers=len(pending)) as waiters:
+               futures = {site: waiters.submit(
+                              parse_admission.run, cache_key,
+                              lambda cache_key=cache_key, data=data: self._parse_in_pool(cache_key, data))
+                          for site, (cache_key, data) in pending.items()}
+               for site, future in futures.items():
+                   frames[site] = (pending[site][0], future.result())
+       else:
+           for site, (cache_key, data) in pending.items():
+               frames[site] = (cache_key, parse_admission.run(
+                   cache_key, lambda: self._parse_and_cache(cache_key, data)))
+
+       sites = list(site_files)
+       combined = concat_inspection_frames(
+           [frames[site][1] for site in sites], sites, list(self.delay_colors.keys()))
+       remember_fingerprint(combined, hashlib.sha256(
+           '|'.join(frames[site][0] for site in sites).encode()).hexdigest())
+       return combined
+
+   def _parse_in_pool(self, cache_key, data):
+       cached = parse_cache.get(cache_key)
+       if cached is not None:
+           return cached
+       pool = _parse_pool()
+       try:
+           df = pool.submit(_parse_workbook, data).result()
+       except BrokenProcessPool:
+           # A worker died; the next parse starts a new pool
+           _discard_parse_pool(pool)
+           raise
+       return parse_cache.put(cache_key, df)
+
+   def _parse_inspection_data(self, data, progress=None, cancel=None):
+       # Header row, column positions and last populated row found by an earlier read of this workbook
+       structure_key = (file_fingerprint(data), 'Data Base', tuple(INSPECTION_COLUMNS))
+       with stage('excel_parse'):
+           df, structure = read_data_base(
+               io.BytesIO(data),
+               INSPECTION_COLUMNS,
+               structure=structure_cache.get(structure_key),
+               progress=progress,
+               cancel=cancel
+           )
+       structure_cache.put(structure_key, structure)
+
+       with stage('clean'):
+           df = self._clean(df)
+       return df
+
+   def _clean(self, df):
+       """Apply the cleaning rules to raw sheet rows, returning the typed frame.
+
+       Cells matching no known label are counted in attrs['unknown_labels'].
+       """
+       df, unknown = normalise(df, self.cleaning_rules)
+       frame = self._inspection_frame(df)
+       frame.attrs['unknown_labels'] = unknown
+       return frame
+
+   def unknown_labels(self, df):
+       """{column: {label: rows}} of the labels the cleaning rules did not recognise when df was loaded"""
+       return df.attrs.get('unknown_labels', {})
+
+   def chunk_counts(self, chunk):
+       """Performance counts of a chunk of raw sheet rows, cleaned as load_inspection_data does.
+
+       Counts are additive, so summing them over the chunks reported while a
+       workbook is read gives provisional KPIs before the load finishes.
+       """
+       return self._performance_counts(self._clean(chunk))
+
+   def kpis_from_counts(self, counts, as_of=None):
+       """The backlog summary and completion metrics behind the dashboard's KPI tiles"""
+       return {
+           'backlog_summary': self._backlog_from_counts(counts),
+           'completion_metrics': self._completion_metrics_from_counts(counts.sum(axis=3), as_of)
+       }
    
+   def _inspection_frame(self, df):
+       """Typed inspection frame for df, converting frames that were not built by load_inspection_data"""
+       return to_inspection_frame(df, list(self.delay_colors.keys()))
+
+   @instrumented()
    def get_backlog_details_by_delay(self, df, selected_delay):
        """Get details of backlog items for selected delay"""
-       backlog_items = df[
-           (df['Backlog?'] == 'Yes') & 
-           (df['Delay'] == selected_delay)
-       ][['Item Class', 'Unit name', 'Scope', 'SECE STATUS']]
-       return backlog_items
-
-   def analyze_data(self, df):
-       backlog_analysis = self._analyze_backlog(df)
-       performance_metrics = self._analyze_performance(df)
-       sce_metrics = self._analyze_sce_performance(df)
-       item_class_analysis = self._analyze_item_class_progress(df)
-       
+       details = self.get_backlog_index(df).select({'Delay': selected_delay})
+       return details[['Item Class', 'Unit name', 'Scope', 'SECE STATUS']]
+
+   @instrumented()
+   def get_backlog_index(self, df):
+       """Backlog drill-down index of df, built once per frame content"""
+       fingerprint = frame_fingerprint(df)
+       index = backlog_indexes.get(fingerprint)
+       if index is None:
+           index = BacklogIndex(self._inspection_frame(df))
+           backlog_indexes.put(fingerprint, index)
+       return index
+
+   @instrumented()
+   def query_backlog(self, df, filters=None, page=1, page_size=100, sort_by=None, ascending=True):
+       """One sorted page of the backlog items matching filters such as
+       {'Delay': '> 3 Yrs', 'Item Class': ['PSV', 'Piping']}; see BacklogIndex.page"""
+       return self.get_backlog_index(df).page(filters, page, page_size, sort_by, ascending)
+
+   @instrumented()
+   def analyze_data(self, df, as_of=None):
+       """Analyse df as of a reference date, today by default.
+
+       The reference month decides which months' backlog is frozen or carried
+       over, and its week number the YTD percentage.
+       """
+       as_of = reference_date(as_of)
+       cache_key = (frame_fingerprint(df), as_of.isoformat())
+       results = analysis_cache.get(cache_key)
+       if results is None:
+           results = self._analyze(df, as_of)
+           analysis_cache.put(cache_key, results)
+       return copy.deepcopy(results)
+
+   @instrumented()
+   def analyze_reference_months(self, df, year=None):
+       """Performance and SCE performance as of the last day of each month of year (default this year).
+
+       Returns {month: {'as_of', 'performance_metrics', 'sce_metrics'}} for months
+       1-12, equal to what analyze_data(df, as_of=...) gives for each month end, from
+       one counting pass instead of twelve analyses.
+       """
+       year = year or date.today().year
+       cache_key = (frame_fingerprint(df), 'reference_months', year)
+       results = analysis_cache.get(cache_key)
+       if results is None:
+           counts = self._performance_counts(df)
+           month_ends = [date(year, month, calendar.monthrange(year, month)[1]) for month in range(1, 13)]
+           performance = self._performance_as_of(counts.sum(axis=3), month_ends)
+           sce = self._performance_as_of(counts[:, :, :, 1], month_ends)
+           results = {
+               as_of.month: {'as_of': as_of, 'performance_metrics': p, 'sce_metrics': s}
+               for as_of, p, s in zip(month_ends, performance, sce)
+           }
+           analysis_cache.put(cache_key, results)
+       return copy.deepcopy(results)
+
+   def invalidate_analysis_cache(self, df=None):
+       """Drop memoized analysis results for one frame, or for every frame when df is None"""
+       if df is None:
+           analysis_cache.clear()
+       else:
+           fingerprint = frame_fingerprint(df)
+           analysis_cache.evict_matching(lambda key: key[0] == fingerprint)
+
+   @instrumented()
+   def analyze_sites(self, df, as_of=None):
+       """Backlog and completion per site, and for the whole portfolio, from one counting pass"""
+       df = self._inspection_frame(df)
+       sites = list(df['Site'].cat.categories)
+       counts = self._performance_counts(df, by='Site')
+
+       site_summary = {}
+       for i, site in enumerate(sites):
+           site_summary[site] = {
+               'backlog_summary': self._backlog_from_counts(counts[i]),
+               'performance_metrics': self._performance_from_counts(counts[i].sum(axis=3), as_of),
+               'sce_metrics': self._performance_from_counts(counts[i][:, :, :, 1], as_of)
+           }
+
+       portfolio = counts.sum(axis=0)
        return {
-           'backlog_summary': backlog_analysis,
-           'performance_metrics': performance_metrics,
-           'sce_metrics': sce_metrics,
-           'item_class_analysis': item_class_analysis
+           'sites': sites,
+           'site_summary': site_summary,
+           'portfolio': {
+               'backlog_summary': self._backlog_from_counts(portfolio),
+               'performance_metrics': self._performance_from_counts(portfolio.sum(axis=3), as_of),
+               'sce_metrics': self._performance_from_counts(portfolio[:, :, :, 1], as_of)
+           }
+       }
+
+   @instrumented()
+   def analyze_incremental(self, df, previous=None, as_of=None):
+       """Analyze df as of a reference date by applying only its row changes to a previous snapshot.
+
+       previous is the fingerprint of the earlier upload of the same site to
+       compare with, see incremental.previous_upload. Returns the analyze_data
+       results and a frame listing the added, removed and changed rows, or None
+       when there is no previous snapshot to compare with.
+       """
+       fingerprint = frame_fingerprint(df)
+       df = self._inspection_frame(df)
+       snapshot = analysed_snapshots.get(fingerprint)
+       base = analysed_snapshots.get(previous) if previous not in (None, fingerprint) else None
+       changes = change_reports.get((previous, fingerprint)) if base is not None else None
+
+       delta = None
+       if base is not None and (snapshot is None or changes is None):
+           delta = diff_frames(base['frame'], df)
+           changes = delta['report']
+           change_reports.put((previous, fingerprint), changes)
+
+       if snapshot is None:
+           if delta is None:
+               counts = self._performance_counts(df)
+               pivot_counts = self._backlog_pivot_counts(df)
+           else:
+               outgoing = base['frame'].iloc[delta['outgoing']]
+               incoming = df.iloc[delta['incoming']]
+               counts = (base['counts'] - self._performance_counts(outgoing)
+                         + self._performance_counts(incoming))
+               pivot_counts = (base['pivot_counts']
+                               .sub(self._backlog_pivot_counts(outgoing), fill_value=0)
+                               .add(self._backlog_pivot_counts(incoming), fill_value=0))
+               pivot_counts = pivot_counts[pivot_counts > 0].astype(int)
+           snapshot = {'frame': df, 'counts': counts, 'pivot_counts': pivot_counts}
+           analysed_snapshots.put(fingerprint, snapshot)
+
+       as_of = reference_date(as_of)
+       results = self._results_from_counts(snapshot['counts'], snapshot['pivot_counts'], as_of)
+       analysis_cache.put((fingerprint, as_of.isoformat()), results)
+       return copy.deepcopy(results), changes
+
+   @instrumented()
+   def _analyze(self, df, as_of=None):
+       df = self._inspection_frame(df)
+       return self._results_from_counts(self._performance_counts(df), self._backlog_pivot_counts(df), as_of)
+
+   def _results_from_counts(self, counts, pivot_counts, as_of=None):
+       return {
+           'backlog_summary': self._backlog_from_counts(counts),
+           'performance_metrics': self._performance_from_counts(counts.sum(axis=3), as_of),
+           'sce_metrics': self._performance_from_counts(counts[:, :, :, 1], as_of),
+           'item_class_analysis': self._item_class_progress_from_counts(counts, pivot_counts)
        }
    
 
@@ -83,11 +351,25 @@ class DataProcessor:
 
 
 
-   def _analyze_backlog(self, df):
-       backlog_items = df[df['Backlog?'] == 'Yes']
-       total_backlog = len(backlog_items)
+   def _performance_counts(self, df, by=None):
+       """Count rows by planned month, completion, backlog, SECE status and on-time completion.
+
+       Returns an array of shape (13, 2, 2, 2, 2) indexed as
+       [month, job done, backlog, SECE, on time]; month 0 holds rows whose planned
+       month is missing or outside 1-12. With ``by`` naming a categorical column
+       the array gets a leading axis with one entry per category.
+       """
+       return self.backend.performance_counts(self._inspection_frame(df), by)
+
+   def _analyze_backlog(self, df, counts=None):
+       if counts is None:
+           counts = self._performance_counts(df)
+       return self._backlog_from_counts(counts)
+
+   def _backlog_from_counts(self, counts):
+       total_backlog = int(counts[:, :, 1].sum())
        
-       sece_backlog = len(backlog_items[backlog_items['SECE STATUS'] == 'SECE'])
+       sece_backlog = int(counts[:, :, 1, 1].sum())
        sece_percentage = (sece_backlog / total_backlog * 100) if total_backlog > 0 else 0
        
        return {
@@ -98,85 +380,106 @@ class DataProcessor:
            }
        }
    
-   def _analyze_performance(self, df):
-        df['PMonth_Num'] = pd.to_numeric(df['PMonth Insp'], errors='coerce')
-        
-        monthly_data = []
-        today = datetime.now()
-        current_month = today.month  # Get current month
-        
-        # Calculate backlog carryover
-        previous_months_backlog = df[
-            (df['PMonth_Num'] < current_month) & 
-            (df['Backlog?'] == 'Yes')
-        ]
-        current_month_backlog = df[
-            (df['PMonth_Num'] == current_month) & 
-            (df['Backlog?'] == 'Yes')
-        ]
-        
+   def _analyze_performance(self, df, counts=None, as_of=None):
+        if counts is None:
+            counts = self._performance_counts(df)
+        return self._performance_from_counts(counts.sum(axis=3), as_of)
+
+   def _analyze_sce_performance(self, df, counts=None, as_of=None):
+        if counts is None:
+            counts = self._performance_counts(df)
+        return self._performance_from_counts(counts[:, :, :, 1], as_of)
+
+   def _performance_from_counts(self, counts, as_of=None):
+        """Build the monthly table and completion metrics from a [month, done, backlog, on time] array"""
+        return self._performance_as_of(counts, [as_of or date.today()])[0]
+
+   def _backlog_as_of(self, backlog, reference_months):
+        """Backlog shown for planned months 1-12 as of each reference month, one row per reference month.
+
+        Terminated months keep their own backlog, the reference month also carries
+        the backlog of every earlier month, and later months have none.
+        """
+        months = np.arange(1, 13)
+        reference = np.asarray(reference_months)[:, None]
+        carried = np.cumsum(backlog[1:13])
+        return np.where(months < reference, backlog[1:13],
+                        np.where(months == reference, carried[reference - 1], 0))
+
+   def _performance_as_of(self, counts, reference_dates):
+        """_performance_from_counts for several reference dates from one pass over counts"""
+        planned = counts.sum(axis=(1, 2, 3))
+        completed = counts[:, 1].sum(axis=(1, 2))
+        backlog = counts[:, :, 1].sum(axis=(1, 2))
+        backlog_as_of = self._backlog_as_of(backlog, [as_of.month for as_of in reference_dates])
+
+        # Everything but the backlog is the same whatever the reference date
+        monthly_totals = []
         for month_num in range(1, 13):
-            month_items = df[df['PMonth_Num'] == month_num]
-            total_planned = len(month_items)
-            completed_count = len(month_items[month_items['Job Done'] == 'Compl'])
-            
-            # Freeze backlog for terminated months (previous months)
-            if month_num < current_month:
-                backlog_count = len(previous_months_backlog[previous_months_backlog['PMonth_Num'] == month_num])
-            # Carry backlog for the current month
-            elif month_num == current_month:
-                backlog_count = len(current_month_backlog) + len(previous_months_backlog)
-            # Future months have no backlog
-            else:
-                backlog_count = 0
-            
+            total_planned = int(planned[month_num])
+            completed_count = int(completed[month_num])
             progress_pct = (completed_count / total_planned * 100) if total_planned > 0 else 0
-            
-            monthly_data.append({
-                'month': self.month_map[month_num],
+            monthly_totals.append((self.month_map[month_num], total_planned, completed_count, round(progress_pct, 1)))
+
+        performance = []
+        for as_of, backlog_counts in zip(reference_dates, backlog_as_of.tolist()):
+            monthly_data = [{
+                'month': month,
                 'total_planned': total_planned,
                 'backlog_count': backlog_count,
                 'completed_count': completed_count,
-                'progress_percentage': round(progress_pct, 1)
+                'progress_percentage': progress_pct
+            } for (month, total_planned, completed_count, progress_pct), backlog_count
+                in zip(monthly_totals, backlog_counts)]
+            performance.append({
+                'monthly_performance': monthly_data,
+                'completion_metrics': self._completion_metrics_from_counts(counts, as_of)
             })
-            
-        return {
-            'monthly_performance': monthly_data,
-            'completion_metrics': self._calculate_completion_metrics(df)
-        }
+        return performance
 
-   def _analyze_sce_performance(self, df):
-        sce_df = df[df['SECE STATUS'] == 'SECE']
-        return self._analyze_performance(sce_df)
+   def _backlog_pivot_counts(self, df):
+       """Count backlog rows per Item Class, Delay and SECE STATUS combination"""
+       df = self._inspection_frame(df)
+       columns = ['Item Class', 'Delay', 'SECE STATUS']
+       cells = self.backend.backlog_cells(df)
 
-   def _analyze_item_class_progress(self, df):
-       backlog_items = df[df['Backlog?'] == 'Yes']
-       
+       # Same layout as an observed groupby: occurring combinations only, levels trimmed to them
+       occupied = np.nonzero(cells)
+       index = pd.MultiIndex.from_arrays(
+           [pd.Categorical.from_codes(codes, dtype=df[column].dtype) for codes, column in zip(occupied, columns)],
+           names=columns
+       ).remove_unused_levels()
+       return pd.Series(cells[occupied], index=index)
+
+   def _analyze_item_class_progress(self, df, counts=None, pivot_counts=None):
+       if counts is None:
+           counts = self._performance_counts(df)
+       if pivot_counts is None:
+           pivot_counts = self._backlog_pivot_counts(df)
+       return self._item_class_progress_from_counts(counts, pivot_counts)
+
+   def _item_class_progress_from_counts(self, counts, pivot_counts):
        # Define the correct order for Delay categories
        delay_order = list(self.delay_colors.keys())
        
        # Define SECE STATUS order
        sece_order = ['SECE', 'Non-SCE']
        
-       # Create pivot table
-       pivot_table = pd.pivot_table(
-           backlog_items,
-           values='Backlog?',
-           index='Item Class',
-           columns=['Delay', 'SECE STATUS'],
-           aggfunc='count',
-           fill_value=0
-       )
-       
        # Reorder columns according to specified order
        ordered_columns = pd.MultiIndex.from_product(
            [delay_order, sece_order],
            names=['Delay', 'SECE STATUS']
        )
-       pivot_table = pivot_table.reindex(columns=ordered_columns)
+
+       # Create pivot table; combinations that never occur stay empty rather than 0
+       if len(pivot_counts):
+           pivot_table = pivot_counts.unstack(['Delay', 'SECE STATUS'], fill_value=0)
+           pivot_table = pivot_table.reindex(columns=ordered_columns)
+       else:
+           pivot_table = pd.DataFrame(index=pd.Index([], name='Item Class'), columns=ordered_columns)
        
-       total_backlog = len(backlog_items)
-       sece_backlog = len(backlog_items[backlog_items['SECE STATUS'] == 'SECE'])
+       total_backlog = int(counts[:, :, 1].sum())
+       sece_backlog = int(counts[:, :, 1, 1].sum())
        equipment_classes = len(pivot_table.index)
        
        return {
@@ -188,25 +491,21 @@ class DataProcessor:
            }
        }
 
-   def _calculate_completion_metrics(self, df):
-        df['CMonth_Num'] = pd.to_numeric(df['CMonth Insp'], errors='coerce')
-        df['PMonth_Num'] = pd.to_numeric(df['PMonth Insp'], errors='coerce')
-        
-        total_jobs = len(df)
-        completed_jobs = len(df[df['Job Done'] == 'Compl'])
+   def _calculate_completion_metrics(self, df, counts=None, as_of=None):
+        if counts is None:
+            counts = self._performance_counts(df)
+        return self._completion_metrics_from_counts(counts.sum(axis=3), as_of)
+
+   def _completion_metrics_from_counts(self, counts, as_of=None):
+        total_jobs = int(counts.sum())
+        completed_jobs = int(counts[:, 1].sum())
         completion_rate = (completed_jobs / total_jobs * 100) if total_jobs > 0 else 0
         
-        on_time_jobs = len(df[
-            (df['Job Done'] == 'Compl') & 
-            (df['CMonth_Num'] <= df['PMonth_Num'])
-        ])
+        on_time_jobs = int(counts[:, 1, :, 1].sum())
         on_time_rate = (on_time_jobs / completed_jobs * 100) if completed_jobs > 0 else 0
         
-        # Calculate YTD percentage based on weeks from Jan 1, 2025
-        today = datetime.now()
-        jan_1_2025 = datetime(2025, 1, 1)  # Start date for YTD calculation
-        delta = today - jan_1_2025
-        week_number = today.isocalendar()[1] #delta.days // 7  # Calculate weeks since Jan 1, 2025
+        # Calculate YTD percentage based on the week of the reference date
+        week_number = (as_of or date.today()).isocalendar()[1]
         ytd_percentage = (week_number / 52) * 100  # YTD percentage based on 52 weeks
         
         # Round to nearest whole integer and ensure it's even
@@ -222,27 +521,116 @@ class DataProcessor:
             'ytd_percentage': int(ytd_percentage_rounded)  # Add YTD percentage (whole even integer)
         }
     
-   def get_monthly_item_class_performance(self, df, selected_month):
+   @instrumented()
+   def get_item_class_month_matrix(self, df):
+       """Get SOW, monthly target and completed counts per item class and planned month"""
+       df = self._inspection_frame(df)
+       item_class = df['Item Class'].cat
+
+       # One count over item class x month x done; month 0 collects unplanned rows
+       counts = self.backend.item_class_month_counts(df)
+
+       # Keep only item classes that occur, as a groupby would
+       observed = counts.sum(axis=(1, 2)) > 0
+       counts = counts[observed]
+       index = pd.Index(item_class.categories[observed], name='Item Class')
+       months = list(range(1, 13))
+
+       return {
+           'sow': pd.Series(counts.sum(axis=(1, 2)), index=index),
+           'target': pd.DataFrame(counts[:, 1:].sum(axis=2), index=index, columns=months),
+           'completed': pd.DataFrame(counts[:, 1:, 1], index=index, columns=months)
+       }
+
+   @instrumented()
+   def get_monthly_item_class_performance(self, df, selected_month, matrix=None):
     """Analyze item class performance for selected month"""
-    df['PMonth_Num'] = pd.to_numeric(df['PMonth Insp'], errors='coerce')
-    
-    # Filter for selected month
-    month_data = df[df['PMonth_Num'] == selected_month]
-    
-    # Group by Item Class
-    performance_data = pd.DataFrame()
-    performance_data['2025 SOW'] = df.groupby('Item Class').size()
-    performance_data['Monthly Target'] = month_data.groupby('Item Class').size()
-    performance_data['Progress Accomplished'] = month_data[month_data['Job Done'] == 'Compl'].groupby('Item Class').size()
-    
-    # Fill NaN with 0
-    performance_data = performance_data.fillna(0).astype(int)
-    
+    if matrix is None:
+        matrix = self.get_item_class_month_matrix(df)
+
+    performance_data = pd.DataFrame({
+        '2025 SOW': matrix['sow'],
+        'Monthly Target': matrix['target'][selected_month],
+        'Progress Accomplished': matrix['completed'][selected_month]
+    })
+
+    return performance_data.astype(int)
+
+   @instrumented()
+   def export_backlog(self, df, fmt, filters=None, sort_by=None, ascending=True):
+       """Export file of the backlog rows matching filters, in the order query_backlog pages them"""
+       index = self.get_backlog_index(df)
+
+       def build():
+           return frame_chunks(index.rows, index.sorted_positions(filters, sort_by, ascending))
+
+       return export_cache.export('backlog', frame_fingerprint(df), build, fmt,
+                                  {'filters': filters, 'sort_by': sort_by, 'ascending': ascending})
+
+   @instrumented()
+   def export_monthly_performance(self, df, fmt, as_of=None):
+       """Export file of the monthly performance and SCE performance tables as of a reference date"""
+       as_of = reference_date(as_of)
+
+       def build():
+           results = self.analyze_data(df, as_of=as_of)
+           tables = []
+           for scope, key in (('All', 'performance_metrics'), ('SCE', 'sce_metrics')):
+               table = pd.DataFrame(results[key]['monthly_performance']).rename(columns=MONTHLY_EXPORT_COLUMNS)
+               table.insert(0, 'Scope', scope)
+               tables.append(table)
+           return [pd.concat(tables, ignore_index=True)]
+
+       return export_cache.export('monthly_performance', frame_fingerprint(df), build, fmt,
+                                  {'as_of': as_of.isoformat()})
+
+   @instrumented()
+   def export_monthly_item_class_performance(self, df, selected_month, fmt):
+       """Export file of get_monthly_item_class_performance for one month"""
+       def build():
+           return [self.get_monthly_item_class_performance(df, selected_month).reset_index()]
+
+       return export_cache.export('monthly_item_class_performance', frame_fingerprint(df), build, fmt,
+                                  {'month': selected_month})
+
+   @instrumented()
+   def export_item_class_pivot(self, df, fmt):
+       """Export file of the backlog per item class, delay and SECE status from the item class analysis"""
+       def build():
+           pivot = pd.DataFrame(self.analyze_data(df)['item_class_analysis']['pivot_table'])
+           pivot.columns = [f"{delay} / {sece}" for delay, sece in pivot.columns]
+           return [pivot.fillna(0).astype(int).rename_axis('Item Class').reset_index()]
+
+       return export_cache.export('item_class_pivot', frame_fingerprint(df), build, fmt)
+
+
+_pool = None
+_pool_lock = threading.Lock()
 
-    return performance_data
 
+def _parse_pool():
+   """Process pool shared by every session, sized like the admission slots that feed it.
 
+   Workers are spawned, or started from a fork server where available, as
+   forking the multithreaded Streamlit server is unsafe.
+   """
+   global _pool
+   with _pool_lock:
+       if _pool is None:
+           method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+           _pool = ProcessPoolExecutor(max_workers=parse_admission.max_workers,
+                                       mp_context=multiprocessing.get_context(method))
+       return _pool
 
 
+def _discard_parse_pool(pool):
+   global _pool
+   with _pool_lock:
+       if _pool is pool:
+           _pool = None
+   pool.shutdown(wait=False)
 
 
+def _parse_workbook(data):
+   """Process pool entry point for DataProcessor.load_sites"""
+   return DataProcessor()._parse_inspection_data(data)
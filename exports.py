@@ -0,0 +1,153 @@
+"""Exports of dashboard tables as CSV, XLSX and Parquet files, written in chunks.
+
+A table is produced as an iterable of frames of at most EXPORT_CHUNK_ROWS
+rows, see frame_chunks, and each chunk is written as it comes: CSV is
+appended chunk by chunk, XLSX goes through openpyxl's write-only mode and
+Parquet through a pyarrow ParquetWriter with one row group per chunk, so an
+export never holds the whole table in memory. Files live in
+CACHE_DIR/exports, named after the dataset, the fingerprint of the frame it
+came from, its filters and the format; asking for the same export again
+returns the existing file.
+"""
+import hashlib
+import json
+import os
+import threading
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+
+from cache import CACHE_DIR
+
+EXPORT_DIR = os.path.join(CACHE_DIR, 'exports')
+EXPORT_CACHE_MB = float(os.environ.get('DASH_EXPORT_CACHE_MB', '512'))
+EXPORT_CHUNK_ROWS = 50_000
+
+# Bump when the layout of an exported table changes so cached files are rewritten
+EXPORT_VERSION = 1
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def frame_chunks(df, positions=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Chunks of the rows of df at positions (all rows when None), taken one chunk at a time.
+
+    At least one, possibly empty, chunk is yielded so writers always see the columns.
+    """
+    if positions is None:
+        positions = range(len(df))
+    yield df.iloc[positions[:chunk_rows]]
+    for start in range(chunk_rows, len(positions), chunk_rows):
+        yield df.iloc[positions[start:start + chunk_rows]]
+
+
+def write_csv(chunks, path):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, header=i == 0, index=False)
+
+
+def write_xlsx(chunks, path, sheet_name='Export'):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    for i, chunk in enumerate(chunks):
+        if i == 0:
+            ws.append([str(column) for column in chunk.columns])
+        # Python scalars, with None for missing cells, as openpyxl expects
+        values = chunk.astype(object)
+        for row in values.where(chunk.notna(), None).to_numpy().tolist():
+            ws.append(row)
+    wb.save(path)
+
+
+def write_parquet(chunks, path):
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(path, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+WRITERS = {
+    'csv': write_csv,
+    'xlsx': write_xlsx,
+    'parquet': write_parquet,
+}
+
+
+class ExportCache:
+    """Export files keyed on dataset, frame fingerprint, filters and format.
+
+    Files beyond ``max_bytes`` are deleted least recently requested first.
+    """
+
+    def __init__(self, directory=EXPORT_DIR, max_bytes=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def path(self, dataset, fingerprint, fmt, filters=None):
+        key = json.dumps([EXPORT_VERSION, dataset, fingerprint, filters], sort_keys=True, default=str)
+        return os.path.join(self.directory, f"{dataset}-{hashlib.sha256(key.encode()).hexdigest()[:24]}.{fmt}")
+
+    def export(self, dataset, fingerprint, build, fmt, filters=None):
+        """Path of the export file, writing the chunks returned by build() only when it is not cached"""
+        if fmt not in WRITERS:
+            raise ValueError(f"Unknown export format {fmt!r}; expected one of {sorted(WRITERS)}")
+        path = self.path(dataset, fingerprint, fmt, filters)
+        with self._lock:
+            lock = self._locks.setdefault(path, threading.Lock())
+        # Concurrent requests for the same export wait for one writer
+        with lock:
+            if os.path.exists(path):
+                os.utime(path)
+                return path
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                WRITERS[fmt](build(), tmp_path)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        self._prune(keep=path)
+        return path
+
+    def _prune(self, keep):
+        if self.max_bytes is None:
+            return
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if os.path.splitext(name)[1][1:] in WRITERS:
+                files.append((os.path.getmtime(path), os.path.getsize(path), path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                os.remove(os.path.join(self.directory, name))
+
+
+export_cache = ExportCache(max_bytes=int(EXPORT_CACHE_MB * 1024 * 1024))
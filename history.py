@@ -0,0 +1,201 @@
+"""Embedded SQLite history of loaded snapshots, for trends across uploads.
+
+Each loaded frame is stored as row counts per site, upload date, item class,
+delay, planned month and status flags, so a snapshot costs a few hundred rows
+however large the workbook. There is one snapshot per site and upload date;
+a different frame for a day already recorded is refused unless it is
+explicitly asked to replace it.
+Trend views are aggregate queries over these counts and never open a workbook.
+"""
+import contextlib
+import hashlib
+import os
+import sqlite3
+from datetime import date
+
+import pandas as pd
+
+from cache import CACHE_DIR
+
+HISTORY_DB = os.environ.get('DASH_HISTORY_DB', os.path.join(CACHE_DIR, 'history.sqlite'))
+
+COUNT_COLUMNS = ['Item Class', 'Delay', 'PMonth_Num', 'is_done', 'is_backlog', 'is_on_time', 'is_sce']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    snapshot_id INTEGER PRIMARY KEY,
+    site TEXT NOT NULL,
+    upload_date TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    recorded_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    total_rows INTEGER NOT NULL,
+    UNIQUE (site, upload_date)
+);
+CREATE TABLE IF NOT EXISTS snapshot_counts (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (snapshot_id) ON DELETE CASCADE,
+    site TEXT NOT NULL,
+    item_class TEXT,
+    delay TEXT,
+    pmonth INTEGER NOT NULL,
+    is_done INTEGER NOT NULL,
+    is_backlog INTEGER NOT NULL,
+    is_on_time INTEGER NOT NULL,
+    is_sce INTEGER NOT NULL,
+    n INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshot_counts_snapshot ON snapshot_counts (snapshot_id);
+CREATE INDEX IF NOT EXISTS snapshot_counts_item_class ON snapshot_counts (site, item_class);
+CREATE INDEX IF NOT EXISTS snapshot_counts_delay ON snapshot_counts (site, delay);
+CREATE INDEX IF NOT EXISTS snapshot_counts_month ON snapshot_counts (site, pmonth);
+"""
+
+# Optional filters of the trend queries and the snapshot_counts columns they apply to
+FILTER_COLUMNS = {'item_class': 'item_class', 'delay': 'delay', 'month': 'pmonth'}
+
+
+class SnapshotConflict(ValueError):
+    """Raised when a different frame is already recorded for the site and upload date"""
+
+
+def workbook_fingerprint(file_fingerprint, site):
+    """History identity of a site workbook from its file content and site only.
+
+    It does not depend on how the workbook is parsed, so an unchanged workbook
+    keeps its identity across parse version bumps.
+    """
+    return hashlib.sha256(f"{file_fingerprint}|{site}".encode()).hexdigest()
+
+
+def _nullable(value):
+    return None if pd.isna(value) else value
+
+
+class HistoryStore:
+    def __init__(self, path=HISTORY_DB):
+        self.path = path
+        self._initialised = False
+
+    @contextlib.contextmanager
+    def _connect(self):
+        if not self._initialised:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA foreign_keys = ON")
+            if not self._initialised:
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.executescript(SCHEMA)
+                self._initialised = True
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def recorded_fingerprint(self, site, upload_date=None):
+        """Fingerprint of the workbook recorded for the site and upload date, or None"""
+        upload_date = (upload_date or date.today()).isoformat()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT fingerprint FROM snapshots WHERE site = ? AND upload_date = ?",
+                (site, upload_date)).fetchone()
+        return row[0] if row is not None else None
+
+    def record(self, df, site, fingerprint, upload_date=None, replace=False):
+        """Store the counts of an inspection frame as the site's snapshot for upload_date.
+
+        fingerprint identifies the workbook df was parsed from, see
+        workbook_fingerprint. Returns the snapshot id. Recording the same
+        workbook for the same day again is a no-op. When a different workbook is
+        recorded for that day, SnapshotConflict is raised unless replace is set.
+        """
+        upload_date = (upload_date or date.today()).isoformat()
+        with self._connect() as conn:
+            existing = conn.execute(
+                "SELECT snapshot_id, fingerprint FROM snapshots WHERE site = ? AND upload_date = ?",
+                (site, upload_date)).fetchone()
+            if existing is not None and existing[1] == fingerprint:
+                return existing[0]
+            if existing is not None:
+                if not replace:
+                    raise SnapshotConflict(
+                        f"A different {site} workbook is already recorded for {upload_date}")
+                conn.execute("DELETE FROM snapshots WHERE snapshot_id = ?", (existing[0],))
+
+            snapshot_id = conn.execute(
+                "INSERT INTO snapshots (site, upload_date, fingerprint, total_rows) VALUES (?, ?, ?, ?)",
+                (site, upload_date, fingerprint, len(df))).lastrowid
+            counts = df.groupby(COUNT_COLUMNS, observed=True, dropna=False).size()
+            counts = counts[counts > 0]
+            conn.executemany(
+                "INSERT INTO snapshot_counts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(snapshot_id, site, _nullable(item_class), _nullable(delay),
+                  int(month), int(done), int(backlog), int(on_time), int(sce), int(n))
+                 for (item_class, delay, month, done, backlog, on_time, sce), n in counts.items()])
+        return snapshot_id
+
+    def snapshots(self, site=None):
+        query = "SELECT snapshot_id, site, upload_date, fingerprint, recorded_at, total_rows FROM snapshots"
+        params = ()
+        if site is not None:
+            query += " WHERE site = ?"
+            params = (site,)
+        with self._connect() as conn:
+            return pd.read_sql_query(query + " ORDER BY site, upload_date", conn, params=params)
+
+    def delete(self, site, upload_date):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM snapshots WHERE site = ? AND upload_date = ?",
+                         (site, upload_date.isoformat()))
+
+    def _aggregate(self, select, site=None, start=None, end=None, **filters):
+        """Per-snapshot aggregates of snapshot_counts, oldest upload first"""
+        where, params = [], []
+        if site is not None:
+            where.append("s.site = ?")
+            params.append(site)
+        if start is not None:
+            where.append("s.upload_date >= ?")
+            params.append(start.isoformat())
+        if end is not None:
+            where.append("s.upload_date <= ?")
+            params.append(end.isoformat())
+        for name, value in filters.items():
+            if name not in FILTER_COLUMNS:
+                raise ValueError(f"Unknown history filter {name!r}")
+            if value is not None:
+                where.append(f"c.{FILTER_COLUMNS[name]} = ?")
+                params.append(value)
+
+        query = f"""
+            SELECT s.site, s.upload_date, {select}
+            FROM snapshots s JOIN snapshot_counts c ON c.snapshot_id = s.snapshot_id
+            {"WHERE " + " AND ".join(where) if where else ""}
+            GROUP BY s.snapshot_id
+            ORDER BY s.site, s.upload_date
+        """
+        with self._connect() as conn:
+            trend = pd.read_sql_query(query, conn, params=params)
+        trend['upload_date'] = pd.to_datetime(trend['upload_date'])
+        return trend
+
+    def backlog_burndown(self, site=None, start=None, end=None, item_class=None, delay=None, month=None):
+        """Total and SECE backlog of each snapshot"""
+        return self._aggregate(
+            "SUM(c.n * c.is_backlog) AS backlog, SUM(c.n * c.is_backlog * c.is_sce) AS sce_backlog",
+            site, start, end, item_class=item_class, delay=delay, month=month)
+
+    def completion_velocity(self, site=None, start=None, end=None, item_class=None, month=None):
+        """Completed jobs per snapshot, with the completions per week since the previous snapshot"""
+        trend = self._aggregate(
+            "SUM(c.n) AS total_jobs, SUM(c.n * c.is_done) AS completed_jobs, "
+            "SUM(c.n * c.is_on_time) AS on_time_jobs",
+            site, start, end, item_class=item_class, month=month)
+        trend['completion_rate'] = (trend['completed_jobs'] / trend['total_jobs'] * 100).round(1)
+        by_site = trend.groupby('site', sort=False)
+        trend['completed_since_previous'] = by_site['completed_jobs'].diff()
+        days = by_site['upload_date'].diff().dt.days
+        trend['weekly_velocity'] = (trend['completed_since_previous'] / days * 7).round(1)
+        return trend
+
+
+history_store = HistoryStore()
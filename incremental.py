@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+from cache import LRUCache
+from schema import INSPECTION_COLUMNS
+
+# Columns that identify an inspection task across weekly re-exports of the workbook
+ROW_KEY_COLUMNS = ['Unit name', 'Item Class', 'Scope', 'PMonth Insp', 'Year']
+REPORT_COLUMNS = ['Item Class', 'Unit name', 'Scope', 'PMonth Insp']
+
+# Analysed frames and their aggregates by fingerprint, shared by all sessions
+analysed_snapshots = LRUCache(max_entries=16)
+# Change reports by (previous fingerprint, fingerprint)
+change_reports = LRUCache(max_entries=64)
+
+SESSION_KEY = 'site_uploads'
+
+
+def previous_upload(session_state, site, fingerprint):
+    """Fingerprint of the upload of site this session loaded before the one with fingerprint, or None.
+
+    Each session compares against its own previous upload, never against what
+    another session last loaded for the site.
+    """
+    uploads = session_state.setdefault(SESSION_KEY, {})
+    previous, current = uploads.get(site, (None, None))
+    if fingerprint != current:
+        previous, current = current, fingerprint
+        uploads[site] = (previous, current)
+    return previous
+
+
+def row_keys(df):
+    """Stable uint64 key per row from the identifying columns and the occurrence among duplicates"""
+    key_hash = pd.util.hash_pandas_object(df[ROW_KEY_COLUMNS], index=False).to_numpy()
+    occurrence = pd.Series(key_hash).groupby(key_hash).cumcount().to_numpy()
+    return pd.util.hash_pandas_object(
+        pd.DataFrame({'key': key_hash, 'occurrence': occurrence}), index=False).to_numpy()
+
+
+def _row_hashes(df):
+    return pd.util.hash_pandas_object(df[INSPECTION_COLUMNS], index=False).to_numpy()
+
+
+def _changed_columns(old_rows, new_rows):
+    changed = pd.DataFrame(index=range(len(new_rows)))
+    for column in INSPECTION_COLUMNS:
+        old_values = old_rows[column].astype(object).to_numpy()
+        new_values = new_rows[column].astype(object).to_numpy()
+        both_missing = pd.isna(old_values) & pd.isna(new_values)
+        changed[column] = (old_values != new_values) & ~both_missing
+    return [', '.join(changed.columns[row]) for row in changed.to_numpy()]
+
+
+def diff_frames(old, new):
+    """Match rows of two snapshots of the same site by row key.
+
+    Returns the positions of rows leaving the aggregates (``outgoing``: removed
+    rows and the old version of changed rows), the positions of rows entering
+    them (``incoming``: added rows and the new version of changed rows), and a
+    ``report`` frame with one line per added, removed or changed row.
+    """
+    old_keys = row_keys(old)
+    new_keys = row_keys(new)
+    match = pd.Index(new_keys).get_indexer(old_keys)
+
+    removed = np.flatnonzero(match < 0)
+    kept_old = np.flatnonzero(match >= 0)
+    kept_new = match[kept_old]
+    added = np.setdiff1d(np.arange(len(new)), kept_new)
+
+    differs = _row_hashes(old)[kept_old] != _row_hashes(new)[kept_new]
+    changed_old = kept_old[differs]
+    changed_new = kept_new[differs]
+
+    removed_rows = old.iloc[removed][REPORT_COLUMNS].astype(object).assign(
+        Change='removed', **{'Changed Columns': ''})
+    added_rows = new.iloc[added][REPORT_COLUMNS].astype(object).assign(
+        Change='added', **{'Changed Columns': ''})
+    changed_rows = new.iloc[changed_new][REPORT_COLUMNS].astype(object).assign(
+        Change='changed',
+        **{'Changed Columns': _changed_columns(old.iloc[changed_old], new.iloc[changed_new])})
+    report = pd.concat([changed_rows, added_rows, removed_rows])
+
+    return {
+        'outgoing': np.concatenate([removed, changed_old]),
+        'incoming': np.concatenate([added, changed_new]),
+        'report': report[['Change', *REPORT_COLUMNS, 'Changed Columns']]
+    }
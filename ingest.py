@@ -0,0 +1,126 @@
+import pandas as pd
+from openpyxl import load_workbook
+
+# Strings pd.read_excel treats as missing by default
+NA_STRINGS = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+    '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+}
+
+
+class ParseCancelled(Exception):
+    """Raised by read_data_base when its cancel event is set"""
+
+
+def _convert_cell(value):
+    if isinstance(value, str):
+        return None if value in NA_STRINGS else value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def resolve_columns(header, columns):
+    """Map each requested column name to its 0-based position in the header row"""
+    positions = {}
+    for i, name in enumerate(header):
+        if name is None:
+            continue
+        name = str(name).strip()
+        if name in columns and name not in positions:
+            positions[name] = i
+    missing = [c for c in columns if c not in positions]
+    if missing:
+        raise ValueError(f"Columns expected but not found in header: {missing}")
+    return positions
+
+
+def scan_structure(ws, columns, max_header_rows=20):
+    """Locate the header row and requested columns of an open read-only worksheet.
+
+    The header is the first of the top ``max_header_rows`` rows naming every
+    column. Returns a dict with the 1-based ``header_row``, ``positions`` mapping
+    each column to its 0-based position and ``last_row`` None, as the last data
+    row is only known once the sheet has been read.
+    """
+    closest, closest_found = (), -1
+    for row_number, row in enumerate(ws.iter_rows(max_row=max_header_rows, values_only=True), start=1):
+        found = len({str(value).strip() for value in row if value is not None}.intersection(columns))
+        if found == len(set(columns)):
+            return {'header_row': row_number, 'positions': resolve_columns(row, columns), 'last_row': None}
+        if found > closest_found:
+            closest, closest_found = row, found
+    # Raises ValueError naming the columns missing from the row that came closest
+    resolve_columns(closest, columns)
+
+
+def read_data_base(source, columns, structure=None, sheet_name='Data Base',
+                   progress=None, cancel=None, progress_every=1000):
+    """Stream the requested columns of the inspection sheet in a single read-only pass.
+
+    ``structure`` is a previous result of this function for the same workbook;
+    without it the header row and column positions are found with
+    scan_structure on the already open sheet. Only the column span covering
+    ``columns`` is decoded, and only up to the last populated row when a
+    previous read measured it; otherwise the whole sheet is read whatever
+    dimensions the file records, as those are often stale in exported
+    workbooks. Fully empty rows are skipped and the index keeps each row's
+    offset below the header, as ``pd.read_excel(...).dropna(how='all')`` would.
+
+    Returns the frame and the workbook structure, whose ``last_row`` is now the
+    last row holding any requested value, so a later read with it stops there.
+
+    Every ``progress_every`` sheet rows, and once at the end, ``progress`` is called
+    with the rows scanned so far, the expected row count (None when neither a
+    previous read nor the sheet's recorded dimensions give it) and a frame of
+    the data rows read since the previous call.
+    Setting the ``cancel`` event stops the read at the next call with ParseCancelled.
+    """
+    wb = load_workbook(source, read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb[sheet_name]
+        # The recorded dimensions only estimate the progress; iter_rows would stop at them
+        recorded_rows = ws.max_row
+        ws.reset_dimensions()
+        if structure is None:
+            structure = scan_structure(ws, columns)
+        header_row = structure['header_row']
+        positions = structure['positions']
+        max_row = structure['last_row']
+        min_col = min(positions.values())
+        max_col = max(positions.values())
+        offsets = [positions[c] - min_col for c in columns]
+
+        values = [[] for _ in columns]
+        index = []
+        expected_rows = max_row or recorded_rows
+        total_rows = expected_rows - header_row if expected_rows else None
+        reported = 0
+
+        def report(rows_scanned):
+            nonlocal reported
+            if cancel is not None and cancel.is_set():
+                raise ParseCancelled()
+            if progress is not None:
+                chunk = pd.DataFrame({c: v[reported:] for c, v in zip(columns, values)}, index=index[reported:])
+                progress(rows_scanned, total_rows, chunk)
+            reported = len(index)
+
+        rows = ws.iter_rows(min_row=header_row + 1, max_row=max_row,
+                            min_col=min_col + 1, max_col=max_col + 1, values_only=True)
+        offset = -1
+        for offset, row in enumerate(rows):
+            if offset and offset % progress_every == 0:
+                report(offset)
+            cells = [_convert_cell(row[o]) if o < len(row) else None for o in offsets]
+            if all(v is None for v in cells):
+                continue
+            index.append(offset)
+            for column_values, value in zip(values, cells):
+                column_values.append(value)
+        report(offset + 1)
+    finally:
+        wb.close()
+
+    last_row = header_row + 1 + index[-1] if index else header_row
+    return pd.DataFrame(dict(zip(columns, values)), index=index), {**structure, 'last_row': last_row}
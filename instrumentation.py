@@ -0,0 +1,141 @@
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+
+import pandas as pd
+
+DIAGNOSTICS_DEFAULT = os.environ.get('DASH_DIAGNOSTICS', '').lower() in ('1', 'true', 'yes')
+
+logger = logging.getLogger('dash.instrumentation')
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+# The run being measured in this thread; each Streamlit rerun executes in its own thread
+_current_run = contextvars.ContextVar('dash_diagnostics_run', default=None)
+
+# tracemalloc is process wide, so concurrent runs share one tracing session
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+
+
+class Run:
+    """Stage timings and allocation peaks collected during one rerun"""
+
+    def __init__(self, site=None):
+        self.run_id = uuid.uuid4().hex[:8]
+        self.site = site
+        self.records = []
+        # Stages nest per thread, as background jobs can record into the run of the rerun that started them
+        self._local = threading.local()
+
+    @property
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def to_frame(self):
+        columns = ['run_id', 'site', 'stage', 'depth', 'seconds', 'peak_kb']
+        return pd.DataFrame(self.records, columns=columns)
+
+
+def _start_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracing_users += 1
+
+
+def _stop_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+@contextlib.contextmanager
+def diagnostics_run(site=None, trace_memory=True):
+    """Collect every instrumented stage executed inside the block into a Run"""
+    run = Run(site)
+    token = _current_run.set(run)
+    if trace_memory:
+        _start_tracing()
+    try:
+        yield run
+    finally:
+        if trace_memory:
+            _stop_tracing()
+        _current_run.reset(token)
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Time a block and measure its allocation peak when a diagnostics run is active.
+
+    Peaks are process wide while tracing, so stages of concurrent sessions can
+    inflate each other's figures. Each record is also logged as a JSON line.
+    """
+    run = _current_run.get()
+    if run is None:
+        yield
+        return
+
+    tracing = tracemalloc.is_tracing()
+    frame = {'start': 0, 'peak': 0}
+    if tracing:
+        current, peak = tracemalloc.get_traced_memory()
+        if run._stack:
+            run._stack[-1]['peak'] = max(run._stack[-1]['peak'], peak)
+        tracemalloc.reset_peak()
+        frame['start'] = current
+    run._stack.append(frame)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        run._stack.pop()
+        record = {
+            'run_id': run.run_id,
+            'site': run.site,
+            'stage': name,
+            'depth': len(run._stack),
+            'seconds': round(seconds, 6),
+            'peak_kb': None
+        }
+        if tracing and tracemalloc.is_tracing():
+            peak = max(tracemalloc.get_traced_memory()[1], frame['peak'])
+            record['peak_kb'] = round(max(peak - frame['start'], 0) / 1024, 1)
+            if run._stack:
+                run._stack[-1]['peak'] = max(run._stack[-1]['peak'], peak)
+        run.records.append(record)
+        logger.info(json.dumps(record))
+
+
+def instrumented(name=None):
+    """Decorator running the function inside stage(name), defaulting to its qualified name"""
+    def decorate(func):
+        stage_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_run.get() is None:
+                return func(*args, **kwargs)
+            with stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
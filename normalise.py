@@ -0,0 +1,111 @@
+"""Declarative cleaning rules for raw inspection sheet columns.
+
+Each rule says how to fill missing values and which labels a column may hold:
+
+    'fill'     value (or callable returning one) for missing cells
+    'labels'   canonical labels; cells matching one ignoring case and
+               surrounding spaces are replaced by it
+    'aliases'  other spellings of a canonical label, matched the same way
+    'other'    label for cells matching nothing; without it they are kept as is
+               (and counted as unknown when 'labels' is given)
+    'numeric'  coerce to numbers; cells that are not numbers become missing
+
+Label columns come out as categoricals with the canonical labels first. normalise()
+applies every rule to a frame of raw rows. Labels are matched once per distinct
+value and the result is taken by code, so the cost per row is a factorize and
+a take whatever the number of rules. Cells that are not known labels or
+numbers are counted in the returned report.
+"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from schema import BACKLOG_ORDER, JOB_DONE_ORDER, SECE_ORDER
+
+
+def inspection_rules(delay_order):
+    """Cleaning rules of the inspection sheet columns"""
+    return {
+        'Item Class': {},
+        'Backlog?': {'fill': 'No', 'labels': BACKLOG_ORDER},
+        'SECE STATUS': {
+            'fill': 'Non-SCE',
+            'labels': SECE_ORDER,
+            'aliases': {'Non-SECE': 'Non-SCE', 'Non SECE': 'Non-SCE', 'Non SCE': 'Non-SCE'},
+            'other': 'Non-SCE',
+        },
+        'Delay': {'labels': delay_order},
+        'Year': {'fill': lambda: datetime.now().year, 'numeric': True},
+        'Job Done': {'fill': 'Not Compl', 'labels': JOB_DONE_ORDER},
+        'CMonth Insp': {'numeric': True},
+        'PMonth Insp': {'numeric': True},
+        'Unit name': {},
+        'Scope': {},
+    }
+
+
+def _unknown_counts(uniques, codes, unknown):
+    """{label: rows} of the distinct values flagged unknown"""
+    if not unknown.any():
+        return {}
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    return {str(label): int(n) for label, n in zip(uniques[unknown], counts[unknown])}
+
+
+def _normalise_labels(values, rule):
+    codes, uniques = pd.factorize(values)
+    labels = pd.Index(uniques.astype(str))
+    known = rule.get('labels')
+    if known is None:
+        mapped = labels.to_numpy(dtype=object)
+        unknown = np.zeros(len(uniques), dtype=bool)
+    else:
+        lookup = {label.upper(): label for label in known}
+        lookup.update({alias.upper(): label for alias, label in rule.get('aliases', {}).items()})
+        mapped = labels.str.strip().str.upper().map(lookup).to_numpy(dtype=object)
+        unknown = pd.isna(mapped)
+        mapped[unknown] = rule['other'] if 'other' in rule else labels[unknown]
+
+    fill = rule.get('fill')
+    if fill is not None:
+        mapped = np.append(mapped, fill() if callable(fill) else fill)
+    leading = list(known or ())
+    categories = pd.Index([*leading, *sorted(set(mapped) - set(leading))])
+    # Missing cells have code -1, which takes the fill value appended last
+    category_codes = np.append(categories.get_indexer(mapped), -1)
+    if fill is not None:
+        category_codes[-1] = category_codes[-2]
+    normalised = pd.Categorical.from_codes(category_codes[codes], categories=categories)
+    return normalised, _unknown_counts(uniques, codes, unknown)
+
+
+def _normalise_numbers(values, rule):
+    numbers = pd.to_numeric(values, errors='coerce')
+    invalid = numbers.isna() & values.notna()
+    report = values[invalid].astype(str).value_counts(sort=False).to_dict() if invalid.any() else {}
+    fill = rule.get('fill')
+    if fill is not None:
+        numbers = numbers.mask(values.isna(), fill() if callable(fill) else fill)
+    return numbers.to_numpy(), {label: int(n) for label, n in report.items()}
+
+
+def normalise(df, rules):
+    """Apply rules to the columns of df they name.
+
+    Returns the cleaned frame and a report {column: {label: rows}} of the cells
+    that matched no label or were not numbers; columns without any are omitted.
+    """
+    columns = {}
+    report = {}
+    for column, rule in rules.items():
+        if column not in df.columns:
+            continue
+        normalise_column = _normalise_numbers if rule.get('numeric') else _normalise_labels
+        columns[column], unknown = normalise_column(df[column], rule)
+        if unknown:
+            report[column] = unknown
+    cleaned = df.copy(deep=False)
+    for column, values in columns.items():
+        cleaned[column] = values
+    return cleaned, report
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+INSPECTION_COLUMNS = ['Item Class', 'Backlog?', 'SECE STATUS', 'Delay', 'Year',
+                      'Job Done', 'CMonth Insp', 'PMonth Insp', 'Unit name', 'Scope']
+
+# Bump whenever the typed layout below changes
+SCHEMA_VERSION = 1
+
+BACKLOG_ORDER = ['Yes', 'No']
+SECE_ORDER = ['SECE', 'Non-SCE']
+JOB_DONE_ORDER = ['Compl', 'Not Compl']
+MONTHS = np.arange(1, 13)
+DERIVED_COLUMNS = ['PMonth_Num', 'CMonth_Num', 'is_backlog', 'is_done', 'is_on_time', 'is_sce']
+
+
+def _categorical(values, categories=()):
+    """Categorical with the given leading categories followed by any other observed labels"""
+    if isinstance(values.dtype, pd.CategoricalDtype) and values.cat.categories.inferred_type in ('string', 'empty'):
+        # Already labelled, e.g. by the cleaning rules: only the category order changes
+        values = values.cat.remove_unused_categories()
+        extras = sorted(set(values.cat.categories) - set(categories))
+        return values.cat.set_categories([*categories, *extras]).array
+    values = values.astype('string')
+    extras = sorted(set(values.dropna().unique()) - set(categories))
+    return pd.Categorical(values, categories=[*categories, *extras])
+
+
+def _month_number(values):
+    """Month 1-12 as int8, with 0 for missing or out-of-range months"""
+    month = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+    return np.where(np.isin(month, MONTHS), month, 0).astype(np.int8)
+
+
+def _category_order(column, delay_order):
+    return {
+        'Backlog?': BACKLOG_ORDER,
+        'SECE STATUS': SECE_ORDER,
+        'Delay': delay_order,
+        'Job Done': JOB_DONE_ORDER,
+    }.get(column, [])
+
+
+def is_inspection_frame(df):
+    # attrs survive column selection and astype, so also check the derived columns are intact
+    return (df.attrs.get('inspection_schema') == SCHEMA_VERSION
+            and all(column in df.columns for column in DERIVED_COLUMNS)
+            and isinstance(df['Item Class'].dtype, pd.CategoricalDtype))
+
+
+def to_inspection_frame(df, delay_order):
+    """Build the compact, typed inspection frame used by every DataProcessor analysis.
+
+    Label columns become categoricals with fixed leading category orders
+    (``delay_order`` for Delay), the month columns are coerced once and their
+    1-12 month numbers stored as int8 ``PMonth_Num``/``CMonth_Num`` columns, and
+    the backlog, completion, on-time and SECE tests are precomputed as bool flags. The
+    result is treated as read-only: analyses filter and aggregate it but never
+    add or overwrite columns. Frames that already follow the schema are
+    returned unchanged.
+    """
+    if is_inspection_frame(df):
+        return df
+    missing = [c for c in INSPECTION_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Inspection data is missing columns: {missing}")
+
+    cmonth = pd.to_numeric(df['CMonth Insp'], errors='coerce')
+    pmonth = pd.to_numeric(df['PMonth Insp'], errors='coerce')
+    is_done = (df['Job Done'] == 'Compl').to_numpy(dtype=bool)
+
+    frame = pd.DataFrame({
+        'Item Class': _categorical(df['Item Class']),
+        'Backlog?': _categorical(df['Backlog?'], BACKLOG_ORDER),
+        'SECE STATUS': _categorical(df['SECE STATUS'], SECE_ORDER),
+        'Delay': _categorical(df['Delay'], delay_order),
+        'Year': pd.to_numeric(df['Year'], errors='coerce').round().astype('Int16'),
+        'Job Done': _categorical(df['Job Done'], JOB_DONE_ORDER),
+        'CMonth Insp': cmonth.astype('float32'),
+        'PMonth Insp': pmonth.astype('float32'),
+        'Unit name': _categorical(df['Unit name']),
+        'Scope': _categorical(df['Scope']),
+        'PMonth_Num': _month_number(pmonth),
+        'CMonth_Num': _month_number(cmonth),
+        'is_backlog': (df['Backlog?'] == 'Yes').to_numpy(dtype=bool),
+        'is_done': is_done,
+        'is_on_time': is_done & (cmonth <= pmonth).to_numpy(dtype=bool),
+        'is_sce': (df['SECE STATUS'] == 'SECE').to_numpy(dtype=bool),
+    }, index=df.index)
+    frame.attrs['inspection_schema'] = SCHEMA_VERSION
+    return frame
+
+
+def concat_inspection_frames(frames, sites, delay_order=()):
+    """Stack per-site inspection frames into one frame with a categorical Site column.
+
+    Categorical columns are given the union of the per-site categories, keeping
+    the fixed leading orders, so the result still follows the schema.
+    """
+    frames = list(frames)
+    if not frames:
+        raise ValueError("No inspection frames to combine")
+    aligned = [frame.copy(deep=False) for frame in frames]
+    for column in frames[0].select_dtypes('category').columns:
+        leading = list(_category_order(column, delay_order))
+        observed = set().union(*(frame[column].cat.categories for frame in frames))
+        categories = [*leading, *sorted(observed - set(leading))]
+        for frame in aligned:
+            frame[column] = frame[column].cat.set_categories(categories)
+
+    combined = pd.concat(aligned, ignore_index=True)
+    combined.insert(0, 'Site', pd.Categorical(
+        np.repeat(sites, [len(frame) for frame in frames]), categories=sites))
+    combined.attrs['inspection_schema'] = SCHEMA_VERSION
+    return combined
@@ -0,0 +1,249 @@
+"""Parsed inspection frames stored once as memory-mapped Arrow IPC files.
+
+Every column of an inspection frame is a fixed-width numpy array (category
+codes, int8 months, bool flags stored as uint8, float32 months, masked Int16
+years), so it is written as a plain Arrow column and read back as a numpy view
+on the mapped file. Sessions, and other server processes, opening the same
+snapshot share the file's pages through the OS page cache instead of each
+holding a copy.
+"""
+import json
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+METADATA_KEY = b'dash_frame'
+INDEX_COLUMN = '__index__'
+MASK_SUFFIX = '__mask__'
+
+
+def _column_arrays(name, values):
+    """Arrow columns and reconstruction spec for one frame column"""
+    dtype = values.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        spec = {'kind': 'category', 'categories': [str(c) for c in dtype.categories], 'ordered': dtype.ordered}
+        return spec, {name: pa.array(values.array.codes)}
+    if isinstance(values.array, pd.arrays.IntegerArray) or isinstance(values.array, pd.arrays.FloatingArray):
+        mask = values.isna().to_numpy()
+        data = values.to_numpy(dtype=dtype.numpy_dtype, na_value=0)
+        spec = {'kind': 'masked', 'dtype': str(dtype)}
+        return spec, {name: pa.array(data), name + MASK_SUFFIX: pa.array(mask.view(np.uint8))}
+    if dtype == bool:
+        return {'kind': 'bool'}, {name: pa.array(values.to_numpy().view(np.uint8))}
+    if dtype.kind in 'iuf':
+        return {'kind': 'numpy'}, {name: pa.array(values.to_numpy())}
+    raise TypeError(f"Column {name!r} of dtype {dtype} cannot be stored in a snapshot")
+
+
+def _temp_path(path):
+    """A scratch name next to path that no other process or thread writes to"""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _write_file(path, df):
+    """Write df to an uncompressed Arrow IPC file at path"""
+    columns = {}
+    specs = []
+    for name in df.columns:
+        spec, arrays = _column_arrays(name, df[name])
+        specs.append({'name': name, **spec})
+        columns.update(arrays)
+    columns[INDEX_COLUMN] = pa.array(df.index.to_numpy(dtype=np.int64))
+
+    metadata = {'columns': specs, 'index_name': df.index.name, 'attrs': df.attrs}
+    table = pa.table(columns).replace_schema_metadata({METADATA_KEY: json.dumps(metadata)})
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def write_snapshot(path, df):
+    """Write df to an uncompressed Arrow IPC file at path, replacing it atomically"""
+    tmp_path = _temp_path(path)
+    try:
+        _write_file(tmp_path, df)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _view(table, name):
+    column = table.column(name)
+    chunk = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+    return chunk.to_numpy(zero_copy_only=True)
+
+
+def read_snapshot(path):
+    """Open a snapshot as a DataFrame whose columns are read-only views on the mapped file"""
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    metadata = json.loads(table.schema.metadata[METADATA_KEY])
+    data = {}
+    for spec in metadata['columns']:
+        name = spec['name']
+        values = _view(table, name)
+        if spec['kind'] == 'category':
+            dtype = pd.CategoricalDtype(spec['categories'], ordered=spec['ordered'])
+            data[name] = pd.Categorical.from_codes(values, dtype=dtype, validate=False)
+        elif spec['kind'] == 'masked':
+            array_type = pd.api.types.pandas_dtype(spec['dtype']).construct_array_type()
+            data[name] = array_type(values, _view(table, name + MASK_SUFFIX).view(bool))
+        elif spec['kind'] == 'bool':
+            data[name] = values.view(bool)
+        else:
+            data[name] = values
+    index = pd.Index(_view(table, INDEX_COLUMN), name=metadata['index_name'], copy=False)
+    df = pd.DataFrame(data, index=index, columns=[spec['name'] for spec in metadata['columns']], copy=False)
+    df.attrs.update(metadata['attrs'])
+    return df
+
+
+class SnapshotLease:
+    """A holder's claim on a mapped snapshot, released explicitly or when garbage collected"""
+
+    def __init__(self, store, key, frame):
+        self.key = key
+        self.frame = frame
+        self._finalizer = weakref.finalize(self, store._release, key)
+
+    def release(self):
+        self._finalizer()
+
+    @property
+    def released(self):
+        return not self._finalizer.alive
+
+
+class SnapshotStore:
+    """Memory-mapped snapshot files keyed by content hash, shared by every session of the server.
+
+    Mapped frames are reference counted through leases. A snapshot nobody
+    leases stays mapped for reuse until more than ``max_unused`` such snapshots
+    are open, and its file may then be deleted when the directory exceeds
+    ``max_bytes``. Leased snapshots are never unmapped or deleted.
+    """
+
+    def __init__(self, directory, max_unused=8, max_bytes=None):
+        self.directory = directory
+        self.max_unused = max_unused
+        self.max_bytes = max_bytes
+        self._frames = {}
+        self._refs = {}
+        self._unused = OrderedDict()
+        self._lock = threading.RLock()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.arrow")
+
+    def _open(self, key, frame):
+        self._frames[key] = frame
+        if not self._refs.get(key):
+            self._unused[key] = None
+            self._unused.move_to_end(key)
+        self._evict()
+        return frame
+
+    def get(self, key):
+        """The mapped frame for key, or None when there is no snapshot"""
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is not None:
+                if key in self._unused:
+                    self._unused.move_to_end(key)
+                return frame
+            path = self.path(key)
+            if not os.path.exists(path):
+                return None
+            try:
+                frame = read_snapshot(path)
+            except (OSError, ValueError, KeyError, pa.ArrowException) as e:
+                print(f"Ignoring unreadable snapshot {path}: {e}")
+                return None
+            return self._open(key, frame)
+
+    def put(self, key, df):
+        """Write df as the snapshot for key and return its mapped replacement"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        tmp_path = _temp_path(path)
+        try:
+            # Serialise outside the lock so other sessions' lookups don't wait on the write
+            _write_file(tmp_path, df)
+            with self._lock:
+                os.replace(tmp_path, path)
+                self._frames.pop(key, None)
+                return self._open(key, read_snapshot(path))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def acquire(self, key):
+        """Lease the snapshot for key so it stays mapped; None when there is no snapshot"""
+        with self._lock:
+            frame = self.get(key)
+            if frame is None:
+                return None
+            self._refs[key] = self._refs.get(key, 0) + 1
+            self._unused.pop(key, None)
+            return SnapshotLease(self, key, frame)
+
+    def _release(self, key):
+        with self._lock:
+            refs = self._refs.get(key, 0) - 1
+            if refs > 0:
+                self._refs[key] = refs
+                return
+            self._refs.pop(key, None)
+            if key in self._frames:
+                self._unused[key] = None
+            self._evict()
+
+    def refcount(self, key):
+        with self._lock:
+            return self._refs.get(key, 0)
+
+    def _evict(self):
+        while len(self._unused) > self.max_unused:
+            key, _ = self._unused.popitem(last=False)
+            self._frames.pop(key, None)
+        if self.max_bytes is None or not os.path.isdir(self.directory):
+            return
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.arrow'):
+                path = os.path.join(self.directory, name)
+                files.append((os.path.getmtime(path), os.path.getsize(path), name[:-len('.arrow')], path))
+        total = sum(size for _, size, _, _ in files)
+        for _, size, key, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if key in self._refs or key in self._frames:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def unmap_unused(self):
+        """Drop every mapping nobody leases; the files stay on disk"""
+        with self._lock:
+            for key in self._unused:
+                self._frames.pop(key, None)
+            self._unused.clear()
+
+    def invalidate(self, key):
+        with self._lock:
+            self._unused.pop(key, None)
+            self._frames.pop(key, None)
+            path = self.path(key)
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    # Windows refuses to delete files that are still mapped
+                    print(f"Could not remove snapshot {path}: {e}")
@@ -1,176 +1,674 @@
+import contextlib
+import sqlite3
+from datetime import date
 import streamlit as st
 import plotly.graph_objects as go
 import pandas as pd
+from admission import ParseRejected, parse_admission
+from background import cancel_parse_job, parse_job_for
+from cache import figure_cache, frame_fingerprint, read_file_bytes
 from data_processing import DataProcessor
+from exports import EXPORT_FORMATS
+from history import SnapshotConflict, history_store, workbook_fingerprint
+from incremental import previous_upload
+from instrumentation import DIAGNOSTICS_DEFAULT, diagnostics_run, instrumented, stage
+from table_styles import backlog_summary_table, performance_table
 
-def apply_delay_colors(val, delay_col):
-    delay_colors = {
-        '< 6 Months': 'background-color: #90EE90',
-        '6 Months < x <1 Yrs': 'background-color: #FFB366',
-        '1 Yrs < x <2 Yrs': 'background-color: #FFE5B4',
-        '2 Yrs < x <3 Yrs': 'background-color: #FFC0CB',
-        '> 3 Yrs': 'background-color: #FF6B6B'
-    }
-    return delay_colors.get(delay_col, '')
+SITES = ["GIR", "DAL", "PAZ", "CLV"]
+BACKLOG_PAGE_SIZE = 100
 
-def create_monthly_performance_chart(monthly_data, title="Monthly Performance Overview"):
-    months = [item['month'] for item in monthly_data]
-    fig = go.Figure()
-    fig.add_trace(go.Bar(
-        name='Plan',
-        x=months,
-        y=[item['total_planned'] for item in monthly_data],
-        marker_color='rgb(30, 144, 255)',
-        text=[item['total_planned'] for item in monthly_data],
-        textposition='inside',
-        insidetextanchor='middle',
-        textfont=dict(size=10, family="Tw Cen MT", color="white")
-    ))
-    fig.add_trace(go.Bar(
-        name='Backlog',
-        x=months,
-        y=[item['backlog_count'] for item in monthly_data],
-        marker_color='rgb(255, 0, 0)',
-        text=[item['backlog_count'] for item in monthly_data],
-        textposition='inside',
-        insidetextanchor='middle',
-        textfont=dict(size=10, family="Tw Cen MT", color="white")
-    ))
-    fig.add_trace(go.Bar(
-        name='Completed',
-        x=months,
-        y=[item['completed_count'] for item in monthly_data],
-        marker_color='rgb(0, 255, 0)',
-        text=[item['completed_count'] for item in monthly_data],
-        textposition='inside',
-        insidetextanchor='middle',
-        textfont=dict(size=10, family="Tw Cen MT", color="black")
-    ))
-    fig.add_trace(go.Scatter(
-        name='Progress %',
-        x=months,
-        y=[item['progress_percentage'] for item in monthly_data],
-        yaxis='y2',
-        line=dict(color='black', width=1),
-        text=[f"{item['progress_percentage']}%" for item in monthly_data],
-        textposition='top center',
-        textfont=dict(size=10, family="Tw Cen MT", color="black")
-    ))
-    fig.update_layout(
-    title=dict(text=title, font=dict(family='Tw Cen MT', size=18), x=0.05, y=0.95),
-    barmode='stack',
-    yaxis=dict(
-        title=dict(text='Work Orders', font=dict(size=16, family="Tw Cen MT", color="black")),
-        range=[0, None],
-        gridcolor=None
-    ),
-    yaxis2=dict(
-        title=dict(text='Progress %', font=dict(size=16, family="Tw Cen MT", color="black")),
-        overlaying='y',
-        side='right',
-        range=[0, 100],
-        gridcolor=None
+FONT = "Tw Cen MT"
+
+# Shared by every dashboard figure so the styling is sent once per figure in a
+# small template instead of Plotly's default theme plus a font dict per trace
+FIGURE_TEMPLATE = go.layout.Template(
+    layout=dict(
+        font=dict(family=FONT, size=12, color="black"),
+        title=dict(font=dict(family=FONT, size=18), x=0.05, y=0.95),
+        xaxis=dict(title=dict(font=dict(size=16, family=FONT, color="black"))),
+        yaxis=dict(title=dict(font=dict(size=16, family=FONT, color="black"))),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5),
+        plot_bgcolor='white'
     ),
-    height=400,
-    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5),
-    plot_bgcolor='white'
+    data=dict(
+        bar=[go.Bar(textfont=dict(family=FONT))],
+        scatter=[go.Scatter(textfont=dict(family=FONT))]
+    )
 )
+
+def _cached_figure(key, build):
+    """Return the figure cached for these aggregate inputs, building it on a miss.
+
+    Cached figures are shared between sessions and must not be modified.
+    """
+    fig = figure_cache.get(key)
+    if fig is None:
+        fig = build()
+        figure_cache.put(key, fig)
     return fig
 
-def create_completion_bar_chart(df, processor):
-    # Get completion data for all months and aggregate by item class
-    item_class_totals = {}
-    for month in range(1, 13):  # Assuming 12 months
-        monthly_data = processor.get_monthly_item_class_performance(df, month)
-        for index, row in monthly_data.iterrows():
-            item_class = index  # Assuming index is the item class
-            completed = row['Progress Accomplished']
-            if item_class in item_class_totals:
-                item_class_totals[item_class] += completed
+def _stacked_bar(name, x, y, color, text_color):
+    return go.Bar(
+        name=name,
+        x=x,
+        y=y,
+        marker_color=color,
+        texttemplate='%{y}',
+        textposition='inside',
+        insidetextanchor='middle',
+        textfont=dict(size=10, color=text_color)
+    )
+
+@instrumented()
+def create_monthly_performance_chart(monthly_data, title="Monthly Performance Overview"):
+    months = tuple(item['month'] for item in monthly_data)
+    planned = tuple(item['total_planned'] for item in monthly_data)
+    backlog = tuple(item['backlog_count'] for item in monthly_data)
+    completed = tuple(item['completed_count'] for item in monthly_data)
+    progress = tuple(item['progress_percentage'] for item in monthly_data)
+
+    def build():
+        fig = go.Figure(layout=dict(template=FIGURE_TEMPLATE))
+        fig.add_trace(_stacked_bar('Plan', months, planned, 'rgb(30, 144, 255)', "white"))
+        fig.add_trace(_stacked_bar('Backlog', months, backlog, 'rgb(255, 0, 0)', "white"))
+        fig.add_trace(_stacked_bar('Completed', months, completed, 'rgb(0, 255, 0)', "black"))
+        fig.add_trace(go.Scatter(
+            name='Progress %',
+            x=months,
+            y=progress,
+            yaxis='y2',
+            line=dict(color='black', width=1),
+            texttemplate='%{y}%',
+            textposition='top center',
+            textfont=dict(size=10, color="black")
+        ))
+        fig.update_layout(
+        title_text=title,
+        barmode='stack',
+        yaxis=dict(title_text='Work Orders', range=[0, None]),
+        yaxis2=dict(
+            title=dict(text='Progress %', font=dict(size=16, family=FONT, color="black")),
+            overlaying='y',
+            side='right',
+            range=[0, 100]
+        ),
+        height=400
+    )
+        return fig
+
+    return _cached_figure(('monthly_performance', title, months, planned, backlog, completed, progress), build)
+
+@instrumented()
+def create_completion_bar_chart(item_class_matrix):
+    # Completed jobs per item class across all planned months
+    item_class_totals = item_class_matrix['completed'].sum(axis=1)
+    item_classes = tuple(item_class_totals.index)
+    completed = tuple(int(value) for value in item_class_totals)
+
+    def build():
+        # Define colors based on completed count
+        colors = []
+        for value in completed:
+            if value > 15:
+                colors.append('rgb(0, 128, 0)')  # Green
+            elif 5 <= value <= 15:
+                colors.append('rgb(255, 165, 0)')  # Orange
             else:
-                item_class_totals[item_class] = completed
-    
-    # Convert to lists for plotting
-    item_classes = list(item_class_totals.keys())
-    completed = list(item_class_totals.values())
-    
-    # Define colors based on completed count
-    colors = []
-    for value in completed:
-        if value > 15:
-            colors.append('rgb(0, 128, 0)')  # Green
-        elif 5 <= value <= 15:
-            colors.append('rgb(255, 165, 0)')  # Orange
-        else:
-            colors.append('rgb(255, 0, 0)')  # Red
-    
-    fig = go.Figure()
-    fig.add_trace(go.Bar(
-        x=item_classes,
-        y=completed,
-        name='Completed',
-        marker_color=colors,
-        text=completed,
-        textposition='auto',
-        textfont=dict(size=14, family="Tw Cen MT", color="black"),
-        width=0.7
-    ))
-    fig.update_layout(
-    title=dict(text="Completed Jobs by Item Class", font=dict(family='Tw Cen MT', size=18), x=0.05, y=0.95),
-    yaxis=dict(
-        title=dict(text='(EXDO+QCAP) - Orders', font=dict(size=14, family="Tw Cen MT", color="black"))
-    ),
-    xaxis=dict(
-        title=dict(text='Item Class', font=dict(size=14, family="Tw Cen MT", color="black"))
-    ),
-    bargap=0.2,
-    height=600,
-    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5),
-    plot_bgcolor='white',
-    font=dict(family="Tw Cen MT", size=12, color="black")
-)
-    return fig
+                colors.append('rgb(255, 0, 0)')  # Red
+
+        fig = go.Figure(layout=dict(template=FIGURE_TEMPLATE))
+        fig.add_trace(go.Bar(
+            x=item_classes,
+            y=completed,
+            name='Completed',
+            marker_color=colors,
+            texttemplate='%{y}',
+            textposition='auto',
+            textfont=dict(size=14, color="black"),
+            width=0.7
+        ))
+        fig.update_layout(
+        title_text="Completed Jobs by Item Class",
+        yaxis=dict(title=dict(text='(EXDO+QCAP) - Orders', font=dict(size=14))),
+        xaxis=dict(title=dict(text='Item Class', font=dict(size=14))),
+        bargap=0.2,
+        height=600
+    )
+        return fig
+
+    return _cached_figure(('completion_bar', item_classes, completed), build)
 
+@instrumented()
+def build_backlog_table(item_class_analysis):
+    df_backlog = pd.DataFrame.from_dict(item_class_analysis['pivot_table'])
+    df_backlog['Totals'] = df_backlog.sum(axis=1)
+    grand_total = df_backlog.sum()
+    df_backlog.loc['Grand Total'] = grand_total
+    return df_backlog
+
+@instrumented()
 def create_backlog_item_class_chart(df_backlog):
-    df_chart = df_backlog.drop(index='Grand Total', columns='Totals')
-    totals = df_chart.sum(axis=1)
-    
-    colors = []
-    for value in totals:
-        if value > 15:
-            colors.append('rgb(255, 0, 0)')
-        elif 10 <= value <= 15:
-            colors.append('rgb(255, 165, 0)')
-        elif 5 <= value < 10:
-            colors.append('rgb(255, 215, 0)')
+    totals = df_backlog['Totals'].drop(index='Grand Total')
+    item_classes = tuple(totals.index)
+    totals = tuple(int(value) for value in totals)
+
+    def build():
+        colors = []
+        for value in totals:
+            if value > 15:
+                colors.append('rgb(255, 0, 0)')
+            elif 10 <= value <= 15:
+                colors.append('rgb(255, 165, 0)')
+            elif 5 <= value < 10:
+                colors.append('rgb(255, 215, 0)')
+            else:
+                colors.append('rgb(0, 128, 0)')
+
+        fig = go.Figure(layout=dict(template=FIGURE_TEMPLATE))
+        fig.add_trace(go.Bar(
+            y=item_classes,
+            x=totals,
+            orientation='h',
+            marker_color=colors,
+            texttemplate='%{x}',
+            textposition='auto',
+            textfont=dict(size=12, color="black"),
+            width=0.7,
+        ))
+        fig.update_layout(
+        title_text="Backlog by Item Class",
+        xaxis_title_text='Number of Items',
+        yaxis_title_text='Item Class',
+        bargap=0.1,
+        height=600
+    )
+        return fig
+
+    return _cached_figure(('backlog_item_class', item_classes, totals), build)
+
+@instrumented()
+def create_site_comparison_chart(site_summary):
+    sites = tuple(site_summary)
+    backlog = tuple(site_summary[site]['backlog_summary']['total_backlog'] for site in sites)
+    completed = tuple(site_summary[site]['performance_metrics']['completion_metrics']['completed_jobs'] for site in sites)
+    completion_rate = tuple(site_summary[site]['performance_metrics']['completion_metrics']['completion_rate'] for site in sites)
+
+    def build():
+        fig = go.Figure(layout=dict(template=FIGURE_TEMPLATE))
+        fig.add_trace(go.Bar(
+            name='Backlog',
+            x=sites,
+            y=backlog,
+            marker_color='rgb(255, 0, 0)',
+            texttemplate='%{y}',
+            textposition='auto',
+            textfont=dict(size=12, color="white")
+        ))
+        fig.add_trace(go.Bar(
+            name='Completed',
+            x=sites,
+            y=completed,
+            marker_color='rgb(0, 255, 0)',
+            texttemplate='%{y}',
+            textposition='auto',
+            textfont=dict(size=12, color="black")
+        ))
+        fig.add_trace(go.Scatter(
+            name='Completion %',
+            x=sites,
+            y=completion_rate,
+            yaxis='y2',
+            mode='lines+markers+text',
+            line=dict(color='black', width=1),
+            texttemplate='%{y}%',
+            textposition='top center',
+            textfont=dict(size=10, color="black")
+        ))
+        fig.update_layout(
+        title_text="Backlog and Completion by Site",
+        barmode='group',
+        yaxis=dict(title_text='Work Orders', range=[0, None]),
+        yaxis2=dict(
+            title=dict(text='Completion %', font=dict(size=16, family=FONT, color="black")),
+            overlaying='y',
+            side='right',
+            range=[0, 100]
+        ),
+        height=400
+    )
+        return fig
+
+    return _cached_figure(('site_comparison', sites, backlog, completed, completion_rate), build)
+
+@instrumented()
+def create_backlog_burndown_chart(burndown, title="Backlog Burn-down"):
+    dates = tuple(burndown['upload_date'].dt.strftime('%Y-%m-%d'))
+    backlog = tuple(int(value) for value in burndown['backlog'])
+    sce_backlog = tuple(int(value) for value in burndown['sce_backlog'])
+
+    def build():
+        fig = go.Figure(layout=dict(template=FIGURE_TEMPLATE))
+        fig.add_trace(go.Scatter(
+            name='Backlog',
+            x=dates,
+            y=backlog,
+            mode='lines+markers',
+            line=dict(color='rgb(255, 0, 0)', width=2)
+        ))
+        fig.add_trace(go.Scatter(
+            name='SCE Backlog',
+            x=dates,
+            y=sce_backlog,
+            mode='lines+markers',
+            line=dict(color='rgb(255, 165, 0)', width=2)
+        ))
+        fig.update_layout(
+        title_text=title,
+        xaxis=dict(title_text='Upload Date', type='date'),
+        yaxis=dict(title_text='Backlog Items', range=[0, None]),
+        height=400
+    )
+        return fig
+
+    return _cached_figure(('backlog_burndown', title, dates, backlog, sce_backlog), build)
+
+@instrumented()
+def create_completion_velocity_chart(velocity, title="Completion Velocity"):
+    dates = tuple(velocity['upload_date'].dt.strftime('%Y-%m-%d'))
+    weekly = tuple(None if pd.isna(value) else float(value) for value in velocity['weekly_velocity'])
+    completion_rate = tuple(float(value) for value in velocity['completion_rate'])
+
+    def build():
+        fig = go.Figure(layout=dict(template=FIGURE_TEMPLATE))
+        fig.add_trace(go.Bar(
+            name='Completed per Week',
+            x=dates,
+            y=weekly,
+            marker_color='rgb(0, 255, 0)',
+            texttemplate='%{y}',
+            textposition='auto',
+            textfont=dict(size=10, color="black")
+        ))
+        fig.add_trace(go.Scatter(
+            name='Completion %',
+            x=dates,
+            y=completion_rate,
+            yaxis='y2',
+            mode='lines+markers',
+            line=dict(color='black', width=1)
+        ))
+        fig.update_layout(
+        title_text=title,
+        xaxis=dict(title_text='Upload Date', type='date'),
+        yaxis=dict(title_text='Work Orders per Week'),
+        yaxis2=dict(
+            title=dict(text='Completion %', font=dict(size=16, family=FONT, color="black")),
+            overlaying='y',
+            side='right',
+            range=[0, 100]
+        ),
+        height=400
+    )
+        return fig
+
+    return _cached_figure(('completion_velocity', title, dates, weekly, completion_rate), build)
+
+def render_site_comparison(processor, site_files):
+    try:
+        df = processor.load_sites(site_files)
+    except ParseRejected as e:
+        st.warning(f"The server is busy: {e}")
+        st.button("Retry")
+        return
+    results = processor.analyze_sites(df)
+    st.markdown(
+        f'<p class="main-title" style="font-size: 32px; color: black; font-family: \'Tw Cen MT\', sans-serif;">Inspection Dashboard - {" / ".join(results["sites"])}</p>',
+        unsafe_allow_html=True)
+
+    site_kpis = pd.DataFrame([
+        {
+            'Site': site,
+            'Total Backlog': summary['backlog_summary']['total_backlog'],
+            'SCE Backlog Rate %': summary['backlog_summary']['sece_metrics']['sece_percentage'],
+            'Completion Progress %': summary['performance_metrics']['completion_metrics']['completion_rate'],
+            'On-time Rate %': summary['performance_metrics']['completion_metrics']['on_time_rate']
+        }
+        for site, summary in results['site_summary'].items()
+    ]).set_index('Site')
+    st.dataframe(site_kpis)
+
+    st.plotly_chart(create_site_comparison_chart(results['site_summary']), width='stretch')
+    st.plotly_chart(
+        create_monthly_performance_chart(results['portfolio']['performance_metrics']['monthly_performance'],
+                                         title="Portfolio Monthly Performance Overview"),
+        width='stretch')
+    st.plotly_chart(
+        create_monthly_performance_chart(results['portfolio']['sce_metrics']['monthly_performance'],
+                                         title="Portfolio SCE Monthly Performance Overview"),
+        width='stretch')
+
+def render_kpi_tiles(backlog_summary, completion_metrics):
+    st.markdown("""
+        <style>
+        .stMetric label {
+            font-family: 'Tw Cen MT', sans-serif !important;
+            font-size: 14px !important;
+            font-weight: bold !important;
+        }
+        .stMetric .css-1wivap2 {
+            font-family: 'Tw Cen MT', sans-serif !important;
+            font-size: 24px !important;
+            font-weight: bold !important;
+            color: #000000 !important;
+        }
+        </style>
+        """, unsafe_allow_html=True)
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        backlog = backlog_summary['total_backlog']
+        st.markdown(
+            f"""
+            <div style="font-family: 'Tw Cen MT'; font-size: 18px; font-weight: bold; color: red;">
+                Total Backlog
+            </div>
+            <div style="font-family: 'Tw Cen MT'; font-size: 18px; font-weight: bold; color: red;">
+                {backlog}
+            </div>
+            """, unsafe_allow_html=True)
+        
+    with col2:
+        sce_backlog_rate = backlog_summary['sece_metrics']['sece_percentage']
+        st.markdown(
+            f"""
+            <div style="font-family: 'Tw Cen MT'; font-size: 18px; font-weight: bold; color: red;">
+                SCE Backlog Rate
+            </div>
+            <div style="font-family: 'Tw Cen MT'; font-size: 18px; font-weight: bold; color: red;">
+                {sce_backlog_rate}%
+            </div>
+            """, unsafe_allow_html=True)
+
+    with col3:
+        compl_rate = completion_metrics['completion_rate']
+        st.markdown(
+            f"""
+            <div style="font-family: 'Tw Cen MT'; font-size: 18px; font-weight: bold; color: black;">
+                Completion Progress
+            </div>
+            <div style="font-family: 'Tw Cen MT'; font-size: 18px; font-weight: bold; color: green;">
+                {compl_rate}%
+            </div>
+            """, unsafe_allow_html=True)
+        
+    with col4:
+        ytd_value = completion_metrics['ytd_percentage']
+        st.markdown(
+            f"""
+            <div style="font-family: 'Tw Cen MT'; font-size: 18px; font-weight: bold; color: black;">
+                YTD Progress
+            </div>
+            <div style="font-family: 'Tw Cen MT'; font-size: 18px; font-weight: bold; color: #1E90FF;">
+                {ytd_value}%
+            </div>
+            """, unsafe_allow_html=True)
+
+@st.fragment(run_every=0.5)
+def render_parse_progress(processor, job):
+    if job.done:
+        st.rerun(scope="app")
+
+    text = f"Reading {job.site} workbook: {job.rows_read:,} rows"
+    queue = parse_admission.stats()
+    if not job.rows_read and queue['queued']:
+        text = f"Waiting to read the {job.site} workbook: {queue['running']} parsing, {queue['queued']} queued"
+    if job.fraction is not None:
+        st.progress(job.fraction, text=f"{text} of {job.total_rows:,}")
+    else:
+        st.caption(text)
+
+    # Provisional tiles from the rows read so far, replaced by the full analysis when done
+    counts = job.counts
+    if counts is not None:
+        kpis = processor.kpis_from_counts(counts)
+        render_kpi_tiles(kpis['backlog_summary'], kpis['completion_metrics'])
+        st.caption("Provisional figures from the rows read so far")
+
+def render_site_dashboard(processor, selected_site, uploaded_file, upload_date=None):
+    st.markdown(
+        f'<p class="main-title" style="font-size: 32px; color: black; font-family: \'Tw Cen MT\', sans-serif;">Inspection Dashboard - {selected_site}</p>',
+        unsafe_allow_html=True)
+
+    # Parsing runs on a worker thread; cached workbooks finish within the short wait
+    job = parse_job_for(st.session_state, processor, uploaded_file, selected_site)
+    if not job.wait(timeout=0.2):
+        render_parse_progress(processor, job)
+        return
+    if isinstance(job.error, ParseRejected):
+        # Forget the rejected job so the retry starts a new one
+        cancel_parse_job(st.session_state)
+        st.warning(f"The server is busy: {job.error}")
+        st.button("Retry")
+        return
+    if job.error is not None:
+        raise job.error
+    df = job.result
+
+    # Changes are reported against this session's own previous upload of the site
+    previous = previous_upload(st.session_state, selected_site, frame_fingerprint(df))
+    results, changes = processor.analyze_incremental(df, previous)
+
+    render_kpi_tiles(results['backlog_summary'], results['performance_metrics']['completion_metrics'])
+                
+    if changes is not None and len(changes):
+        with st.expander(f"{len(changes)} rows changed since your previous {selected_site} upload"):
+            st.dataframe(changes, hide_index=True)
+
+    unknown_labels = processor.unknown_labels(df)
+    if unknown_labels:
+        rows = [{'Column': column, 'Label': label, 'Rows': count}
+                for column, labels in unknown_labels.items() for label, count in labels.items()]
+        with st.expander(f"{len(rows)} unrecognised labels in the {selected_site} workbook"):
+            st.dataframe(pd.DataFrame(rows), hide_index=True)
+
+    # job.key holds the site and the fingerprint of the uploaded file
+    render_history_controls(df, selected_site, workbook_fingerprint(job.key[1], selected_site), upload_date)
+
+    render_analysis_tabs(processor, df, results, selected_site)
+
+@st.fragment
+def render_analysis_tabs(processor, df, results, selected_site):
+    # Switching tabs reruns only this fragment, and only the open tab is built
+    tab1, tab2, tab3 = st.tabs(["Performance Analysis", "Backlog Analysis", "Trends"],
+                               key="analysis_tab", on_change="rerun")
+    if tab1.open:
+        with tab1:
+            render_performance_tab(processor, df)
+    if tab2.open:
+        with tab2:
+            render_backlog_tab(processor, df, results)
+    if tab3.open:
+        with tab3:
+            render_trends_tab(processor, selected_site)
+
+def render_performance_tab(processor, df):
+    item_class_matrix = processor.get_item_class_month_matrix(df)
+    render_monthly_performance_charts(processor, df)
+    st.plotly_chart(
+        create_completion_bar_chart(item_class_matrix),
+        width='stretch')
+
+    st.markdown("""
+        <style>
+        div[data-baseweb="select"] {
+            width: 100px !important;
+        }
+        </style>
+        """, unsafe_allow_html=True)
+
+    render_monthly_performance_table(processor, df, item_class_matrix)
+
+@st.fragment
+def render_monthly_performance_charts(processor, df):
+    # Every month end is analysed in one batch, so moving the slider only picks another result
+    reference_months = processor.analyze_reference_months(df)
+    as_of_month = st.select_slider(
+        "Backlog as of end of",
+        options=list(range(1, 13)),
+        value=date.today().month,
+        format_func=lambda x: processor.month_map[x],
+        key="as_of_month")
+    reference = reference_months[as_of_month]
+
+    st.plotly_chart(
+        create_monthly_performance_chart(reference['performance_metrics']['monthly_performance']),
+        width='stretch')
+    st.plotly_chart(
+        create_monthly_performance_chart(reference['sce_metrics']['monthly_performance'],
+                                      title="SCE Monthly Performance Overview"),
+        width='stretch')
+    render_export_buttons(
+        lambda fmt: processor.export_monthly_performance(df, fmt, reference['as_of']),
+        f"monthly_performance_{reference['as_of'].isoformat()}", key="monthly_performance_export")
+
+@st.fragment
+def render_monthly_performance_table(processor, df, item_class_matrix):
+    selected_month = st.selectbox(
+        "Monthly Progress",
+        options=range(1, 13),
+        format_func=lambda x: processor.month_map[x])
+
+    monthly_performance = processor.get_monthly_item_class_performance(
+        df, selected_month, matrix=item_class_matrix)
+
+    with stage('render:monthly_performance_table'):
+        st.dataframe(performance_table(monthly_performance))
+    render_export_buttons(
+        lambda fmt: processor.export_monthly_item_class_performance(df, selected_month, fmt),
+        f"item_class_performance_{processor.month_map[selected_month]}", key="monthly_item_class_export")
+
+def render_backlog_tab(processor, df, results):
+    st.subheader("Backlog Summary")
+    df_backlog = build_backlog_table(results['item_class_analysis'])
+
+    with stage('render:backlog_summary_table'):
+        st.dataframe(backlog_summary_table(df_backlog, processor.delay_colors))
+    render_export_buttons(lambda fmt: processor.export_item_class_pivot(df, fmt), "backlog_summary",
+                          key="backlog_summary_export")
+
+    st.plotly_chart(create_backlog_item_class_chart(df_backlog), width='stretch')
+
+    render_backlog_details(processor, df)
+
+@st.fragment
+def render_backlog_details(processor, df):
+    # Filters, sorting and paging are answered from the backlog index; only one page is sent
+    index = processor.get_backlog_index(df)
+    detail_columns = ['Item Class', 'Unit name', 'Scope', 'SECE STATUS']
+
+    delay_col, class_col, sece_col, unit_col = st.columns(4)
+    with delay_col:
+        delay_options = list(processor.delay_colors.keys())
+        selected_delay = st.selectbox("Filter by Delay", options=delay_options, key="delay_filter")
+    with class_col:
+        item_classes = st.multiselect("Item Class", index.labels('Item Class'), key="backlog_item_class")
+    with sece_col:
+        sece_status = st.multiselect("SECE Status", index.labels('SECE STATUS'), key="backlog_sece")
+    with unit_col:
+        units = st.multiselect("Unit", index.labels('Unit name'), key="backlog_unit")
+
+    sort_col, order_col, page_col = st.columns(3)
+    with sort_col:
+        sort_by = st.selectbox("Sort by", options=[None, *detail_columns],
+                               format_func=lambda x: x or "Workbook order", key="backlog_sort")
+    with order_col:
+        descending = st.toggle("Descending", key="backlog_descending")
+    with page_col:
+        page = st.number_input("Page", min_value=1, value=1, step=1, key="backlog_page")
+
+    if selected_delay:
+        filters = {
+            'Delay': selected_delay,
+            'Item Class': item_classes,
+            'SECE STATUS': sece_status,
+            'Unit name': units
+        }
+        result = processor.query_backlog(df, filters, page, BACKLOG_PAGE_SIZE, sort_by, not descending)
+        st.caption(f"{result['total']} backlog items - page {result['page']} of {result['pages']}")
+        with stage('render:backlog_details_table'):
+            st.dataframe(result['rows'][detail_columns])
+        render_export_buttons(
+            lambda fmt: processor.export_backlog(df, fmt, filters, sort_by, not descending),
+            "backlog_items", key="backlog_export")
+
+def render_export_buttons(export, file_stem, key):
+    # export(fmt) writes, or finds in the export cache, the file only when its button is clicked
+    for column, (fmt, mime) in zip(st.columns(len(EXPORT_FORMATS)), EXPORT_FORMATS.items()):
+        column.download_button(
+            f"Download {fmt.upper()}",
+            data=lambda fmt=fmt: read_file_bytes(export(fmt)),
+            file_name=f"{file_stem}.{fmt}",
+            mime=mime,
+            key=f"{key}_{fmt}",
+            on_click="ignore")
+
+def render_history_controls(df, selected_site, fingerprint, upload_date=None):
+    # The workbook is only added to the trend history when asked, and never replaces a recorded one silently
+    upload_date = upload_date or date.today()
+    try:
+        recorded = history_store.recorded_fingerprint(selected_site, upload_date)
+        if recorded == fingerprint:
+            st.caption(f"This workbook is the {selected_site} history entry for {upload_date}")
+        elif recorded is None:
+            if st.button(f"Add to {selected_site} history for {upload_date}", key="history_add"):
+                history_store.record(df, selected_site, fingerprint, upload_date)
+                st.rerun()
         else:
-            colors.append('rgb(0, 128, 0)')
-    
-    fig = go.Figure()
-    fig.add_trace(go.Bar(
-        y=df_chart.index,
-        x=totals,
-        orientation='h',
-        marker_color=colors,
-        text=totals,
-        textposition='auto',
-        textfont=dict(size=12, family="Tw Cen MT", color="black"),
-        width=0.7,
-    ))
-    fig.update_layout(
-    title=dict(text="Backlog by Item Class", font=dict(family='Tw Cen MT', size=18), x=0.05, y=0.95),
-    xaxis=dict(
-        title=dict(text='Number of Items', font=dict(size=16, family="Tw Cen MT", color="black"))
-    ),
-    yaxis=dict(
-        title=dict(text='Item Class', font=dict(size=16, family="Tw Cen MT", color="black"))
-    ),
-    bargap=0.1,
-    height=600,
-    plot_bgcolor='white',
-    font=dict(family="Tw Cen MT", size=12)
-)
-    return fig
+            st.warning(f"A different {selected_site} workbook is already in the history for {upload_date}.")
+            if st.button(f"Replace the {upload_date} {selected_site} history entry", key="history_replace"):
+                history_store.record(df, selected_site, fingerprint, upload_date, replace=True)
+                st.rerun()
+    except SnapshotConflict as e:
+        # Another session recorded the same day in the meantime
+        st.warning(str(e))
+    except (sqlite3.Error, OSError) as e:
+        # History only feeds the Trends tab; the upload itself is still analysed
+        print(f"Could not record {selected_site} history: {e}")
+
+@st.fragment
+def render_trends_tab(processor, selected_site):
+    # Served from the history store, so no workbook is read here
+    delay_options = [None, *processor.delay_colors.keys()]
+    selected_delay = st.selectbox("Backlog Delay", options=delay_options,
+                                  format_func=lambda x: x or "All delays", key="trend_delay")
+    with stage('history:query'):
+        burndown = history_store.backlog_burndown(selected_site, delay=selected_delay)
+        velocity = history_store.completion_velocity(selected_site)
+    if len(velocity) < 2:
+        st.info(f"Trends appear once {selected_site} workbooks from at least two upload dates have been added to the history.")
+    st.plotly_chart(create_backlog_burndown_chart(burndown), width='stretch')
+    st.plotly_chart(create_completion_velocity_chart(velocity), width='stretch')
+
+def render_diagnostics(run, history_size=20):
+    # Runs are kept rather than their frames, as stages of a parse job started by a run finish after it is shown
+    history = st.session_state.setdefault('diagnostics_runs', [])
+    history.append(run)
+    del history[:-history_size]
+
+    with st.sidebar.expander("Diagnostics", expanded=True):
+        st.caption(f"Run {run.run_id} - {run.site or 'no site'}")
+        current = run.to_frame()
+        st.dataframe(
+            current.drop(columns=['run_id', 'site']).sort_values('seconds', ascending=False),
+            hide_index=True)
+
+        # Top-level stages only, so nested calls are not counted twice
+        runs = pd.concat([past.to_frame() for past in history], ignore_index=True)
+        per_run = (runs[runs['depth'] == 0]
+                   .groupby(['run_id', 'site'], sort=False, dropna=False)['seconds'].sum()
+                   .round(3).reset_index())
+        st.caption("Recent reruns")
+        st.dataframe(per_run, hide_index=True)
 
 def main():
     st.set_page_config(layout='wide', page_title='Inspection Program Dashboard')
@@ -193,184 +691,39 @@ def main():
     processor = DataProcessor()
     with st.sidebar:
         st.title("Settings")
-        selected_site = st.radio("Select Site", ["GIR", "DAL", "PAZ", "CLV"])
-        uploaded_file = st.file_uploader("Upload Excel File", type=["xlsm"])
-
-    if uploaded_file and selected_site:
-        df = processor.load_inspection_data(uploaded_file, selected_site)
-        results = processor.analyze_data(df)
-        st.markdown(
-            f'<p class="main-title" style="font-size: 32px; color: black; font-family: \'Tw Cen MT\', sans-serif;">Inspection Dashboard - {selected_site}</p>',
-            unsafe_allow_html=True)
-
-        st.markdown("""
-            <style>
-            .stMetric label {
-                font-family: 'Tw Cen MT', sans-serif !important;
-                font-size: 14px !important;
-                font-weight: bold !important;
-            }
-            .stMetric .css-1wivap2 {
-                font-family: 'Tw Cen MT', sans-serif !important;
-                font-size: 24px !important;
-                font-weight: bold !important;
-                color: #000000 !important;
-            }
-            </style>
-            """, unsafe_allow_html=True)
+        mode = st.radio("Mode", ["Single Site", "Compare Sites"])
+        selected_site = uploaded_file = upload_date = None
+        site_files = {}
+        if mode == "Single Site":
+            selected_site = st.radio("Select Site", SITES)
+            uploaded_file = st.file_uploader("Upload Excel File", type=["xlsm"])
+            upload_date = st.date_input("Upload Date", value=date.today(),
+                                        help="Date the workbook's data is recorded under in the trend history")
+        else:
+            for site in SITES:
+                site_file = st.file_uploader(f"Upload {site} Excel File", type=["xlsm"], key=f"upload_{site}")
+                if site_file:
+                    site_files[site] = site_file
+        diagnostics = st.checkbox("Diagnostics", value=DIAGNOSTICS_DEFAULT)
 
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            backlog = results['backlog_summary']['total_backlog']
-            st.markdown(
-                f"""
-                <div style="font-family: 'Tw Cen MT'; font-size: 18px; font-weight: bold; color: red;">
-                    Total Backlog
-                </div>
-                <div style="font-family: 'Tw Cen MT'; font-size: 18px; font-weight: bold; color: red;">
-                    {backlog}
-                </div>
-                """, unsafe_allow_html=True)
-            
-        with col2:
-            sce_backlog_rate = results['backlog_summary']['sece_metrics']['sece_percentage']
-            st.markdown(
-                f"""
-                <div style="font-family: 'Tw Cen MT'; font-size: 18px; font-weight: bold; color: red;">
-                    SCE Backlog Rate
-                </div>
-                <div style="font-family: 'Tw Cen MT'; font-size: 18px; font-weight: bold; color: red;">
-                    {sce_backlog_rate}%
-                </div>
-                """, unsafe_allow_html=True)
-
-        with col3:
-            compl_rate = results['performance_metrics']['completion_metrics']['completion_rate']
-            st.markdown(
-                f"""
-                <div style="font-family: 'Tw Cen MT'; font-size: 18px; font-weight: bold; color: black;">
-                    Completion Progress
-                </div>
-                <div style="font-family: 'Tw Cen MT'; font-size: 18px; font-weight: bold; color: green;">
-                    {compl_rate}%
-                </div>
-                """, unsafe_allow_html=True)
-            
-        with col4:
-            ytd_value = results['performance_metrics']['completion_metrics']['ytd_percentage']
-            st.markdown(
-                f"""
-                <div style="font-family: 'Tw Cen MT'; font-size: 18px; font-weight: bold; color: black;">
-                    YTD Progress
-                </div>
-                <div style="font-family: 'Tw Cen MT'; font-size: 18px; font-weight: bold; color: #1E90FF;">
-                    {ytd_value}%
-                </div>
-                """, unsafe_allow_html=True)
-                    
-        tab1, tab2 = st.tabs(["Performance Analysis", "Backlog Analysis"])
-        with tab1:
-            st.plotly_chart(
-                create_monthly_performance_chart(results['performance_metrics']['monthly_performance']),
-                use_container_width=True)
-            st.plotly_chart(
-                create_monthly_performance_chart(results['sce_metrics']['monthly_performance'],
-                                              title="SCE Monthly Performance Overview"),
-                use_container_width=True)
-            st.plotly_chart(
-                create_completion_bar_chart(df, processor),  # Pass both df and processor
-                use_container_width=True)
-
-            st.markdown("""
-                <style>
-                div[data-baseweb="select"] {
-                    width: 100px !important;
-                }
-                </style>
-                """, unsafe_allow_html=True)
-
-            selected_month = st.selectbox(
-                "Monthly Progress",
-                options=range(1, 13),
-                format_func=lambda x: processor.month_map[x])
-
-            monthly_performance = processor.get_monthly_item_class_performance(df, selected_month)
-
-            def style_performance(val):
-                target = val['Monthly Target']
-                progress = val['Progress Accomplished']
-                difference = target - progress
-                if progress >= target:
-                    return ['background-color: #90EE90']*len(val)
-                elif 0 < difference <= 5:
-                    return ['background-color: #FFB366']*len(val)
-                else:
-                    return ['background-color: #FF9999']*len(val)
-
-            st.dataframe(
-                monthly_performance.style.apply(style_performance, axis=1)
-                .format("{:,.0f}")
-                .set_properties(**{'text-align': 'center', 'color': 'black', 'font-weight': '500'})
-                .set_table_styles([
-                    {'selector': 'th', 'props': [('text-align', 'center'), ('color', 'black'), 
-                                               ('font-weight', 'bold'), ('font-family', 'Tw Cen MT'), 
-                                               ('font-size', '12px')]},
-                    {'selector': 'td', 'props': [('text-align', 'center'), ('color', 'black'), 
-                                               ('font-family', 'Tw Cen MT'), ('font-size', '12px')]}]))
+    if not (mode == "Single Site" and uploaded_file):
+        # Stop parsing a workbook that is no longer selected
+        cancel_parse_job(st.session_state)
 
-        with tab2:
-            st.subheader("Backlog Summary")
-            df_backlog = pd.DataFrame.from_dict(results['item_class_analysis']['pivot_table'])
-            df_backlog['Totals'] = df_backlog.sum(axis=1)
-            grand_total = df_backlog.sum()
-            df_backlog.loc['Grand Total'] = grand_total
-
-            st.dataframe(
-                df_backlog.style
-                .format(lambda x: "" if pd.isna(x) or x == 0 else f"{int(x)}")
-                .apply(lambda x: [apply_delay_colors(v, k) for v, k in zip(x, x.index)])
-                .set_properties(**{
-                    'text-align': 'center',
-                    'color': 'black',
-                    'font-family': 'Tw Cen MT',
-                    'font-size': '9px'
-                })
-                .set_table_styles([
-                    {'selector': 'th', 'props': [
-                        ('text-align', 'center'),
-                        ('color', 'black'),
-                        ('font-family', 'Tw Cen MT'),
-                        ('font-size', '9px'),
-                        ('font-weight', 'bold')
-                    ]},
-                    {'selector': 'td', 'props': [
-                        ('text-align', 'center'),
-                        ('color', 'black'),
-                        ('font-family', 'Tw Cen MT'),
-                        ('font-size', '9px')
-                    ]},
-                    {'selector': 'td:last-child', 'props': [('font-weight', 'bold')]}
-                ])
-            )
-
-            st.plotly_chart(create_backlog_item_class_chart(df_backlog), use_container_width=True)
-
-            delay_options = list(processor.delay_colors.keys())
-            selected_delay = st.selectbox("Filter by Delay", options=delay_options, key="delay_filter")
-
-            if selected_delay:
-                delay_details = processor.get_backlog_details_by_delay(df, selected_delay)
-                st.dataframe(
-                    delay_details.style
-                    .set_properties(**{'text-align': 'center', 'color': 'black', 'font-weight': '500'})
-                    .set_table_styles([
-                        {'selector': 'th', 'props': [('text-align', 'center'), ('color', 'black'), 
-                                                   ('font-family', 'Tw Cen MT'), ('font-size', '12px')]},
-                        {'selector': 'td', 'props': [('text-align', 'left'), ('color', 'black'), 
-                                                   ('font-family', 'Tw Cen MT'), ('font-size', '12px')]}]))
+    run_site = selected_site if mode == "Single Site" else ",".join(site_files)
+    with (diagnostics_run(site=run_site) if diagnostics else contextlib.nullcontext()) as run:
+        if mode == "Compare Sites":
+            if site_files:
+                render_site_comparison(processor, site_files)
+            else:
+                st.info("Please upload the Insp Program files of the sites to compare to begin the analysis.")
+        elif uploaded_file and selected_site:
+            render_site_dashboard(processor, selected_site, uploaded_file, upload_date)
+        else:
+            st.info("Please upload the Insp Program file according to the site selection to begin the analysis.")
 
-    else:
-        st.info("Please upload the Insp Program file according to the site selection to begin the analysis.")
+    if run is not None:
+        render_diagnostics(run)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,60 @@
+"""Vectorised cell styling for the dashboard tables.
+
+Cell styles are computed as whole arrays from the aggregate frames and attached
+with a single ``Styler.apply(axis=None)`` call rather than a Python callback per
+row or cell. Only cell colours and display formats are set: st.dataframe's grid
+ignores table-level CSS such as fonts and alignment.
+"""
+import numpy as np
+import pandas as pd
+
+ON_TARGET_COLOR = '#90EE90'
+NEAR_TARGET_COLOR = '#FFB366'
+BEHIND_TARGET_COLOR = '#FF9999'
+
+# Progress this many jobs or fewer behind the monthly target counts as near target
+NEAR_TARGET_MARGIN = 5
+
+
+def _background(colors):
+    return np.array([f'background-color: {color}' if color else '' for color in colors], dtype=object)
+
+
+def _styles_frame(df, styles):
+    return pd.DataFrame(styles, index=df.index, columns=df.columns)
+
+
+def performance_styles(performance):
+    """Row colours of the monthly item class table from progress against target"""
+    target = performance['Monthly Target'].to_numpy()
+    progress = performance['Progress Accomplished'].to_numpy()
+    difference = target - progress
+    level = np.select(
+        [progress >= target, (difference > 0) & (difference <= NEAR_TARGET_MARGIN)], [0, 1], 2)
+    row_styles = _background([ON_TARGET_COLOR, NEAR_TARGET_COLOR, BEHIND_TARGET_COLOR])[level]
+    return _styles_frame(performance, np.repeat(row_styles[:, None], performance.shape[1], axis=1))
+
+
+def delay_styles(df_backlog, delay_colors):
+    """Column colours of the backlog summary from the Delay level of its columns"""
+    delays = df_backlog.columns.get_level_values(0)
+    column_styles = _background(delays.map(delay_colors).fillna(''))
+    return _styles_frame(df_backlog, np.tile(column_styles, (len(df_backlog), 1)))
+
+
+def styled_table(df, styles, **format_kwargs):
+    """Styler carrying precomputed cell styles and a vectorised number format"""
+    styler = df.style.apply(lambda _: styles, axis=None)
+    if format_kwargs:
+        styler = styler.format(**format_kwargs)
+    return styler
+
+
+def performance_table(performance):
+    return styled_table(performance, performance_styles(performance), precision=0, thousands=',')
+
+
+def backlog_summary_table(df_backlog, delay_colors):
+    # Zero and missing counts are shown blank
+    counts = df_backlog.mask(df_backlog == 0)
+    return styled_table(counts, delay_styles(counts, delay_colors), precision=0, na_rep='')
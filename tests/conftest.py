@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Set before the app modules are imported, so tests never touch the user's caches or history
+os.environ.setdefault('DASH_CACHE_DIR', tempfile.mkdtemp(prefix='dash-tests-'))
+os.environ.setdefault('DASH_HISTORY_DB', os.path.join(os.environ['DASH_CACHE_DIR'], 'history.sqlite'))
@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+
+from admission import ParseAdmission, ParseRejected
+from ingest import ParseCancelled
+
+
+def test_waiter_parses_itself_when_the_owner_cancels():
+    admission = ParseAdmission(max_workers=1, max_queued=4)
+    started = threading.Event()
+    owner_cancel = threading.Event()
+    results = {}
+
+    def owner_parse():
+        started.set()
+        owner_cancel.wait()
+        raise ParseCancelled()
+
+    def owner():
+        with pytest.raises(ParseCancelled):
+            admission.run('key', owner_parse, owner_cancel)
+
+    def waiter():
+        results['waiter'] = admission.run('key', lambda: 'parsed by waiter')
+
+    owner_thread = threading.Thread(target=owner)
+    owner_thread.start()
+    started.wait()
+    waiter_thread = threading.Thread(target=waiter)
+    waiter_thread.start()
+    time.sleep(0.2)
+    owner_cancel.set()
+    owner_thread.join()
+    waiter_thread.join()
+
+    assert results == {'waiter': 'parsed by waiter'}
+    assert admission.stats() == {'running': 0, 'queued': 0, 'deduplicated': 1, 'rejected': 0}
+
+
+def test_identical_parses_share_one_failure():
+    admission = ParseAdmission(max_workers=2, max_queued=4)
+    calls = []
+    errors = []
+
+    def parse():
+        calls.append(1)
+        time.sleep(0.2)
+        raise ValueError('bad workbook')
+
+    def run():
+        try:
+            admission.run('key', parse)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(errors) == 3
+    assert admission.stats()['deduplicated'] == 2
+
+
+def test_full_queue_rejects():
+    admission = ParseAdmission(max_workers=1, max_queued=0)
+    release = threading.Event()
+    thread = threading.Thread(target=admission.run, args=('a', release.wait))
+    thread.start()
+    while admission.stats()['running'] == 0:
+        time.sleep(0.01)
+    with pytest.raises(ParseRejected):
+        admission.run('b', lambda: None)
+    release.set()
+    thread.join()
@@ -0,0 +1,29 @@
+from datetime import date, datetime
+
+import pytest
+
+from benchmarks.generate_workbook import generate_workbook
+from cache import analysis_cache
+from data_processing import DataProcessor, reference_date
+
+
+@pytest.fixture(scope='module')
+def df(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('workbooks') / 'inspection.xlsm')
+    generate_workbook(path, 200)
+    return DataProcessor().load_inspection_data(path, 'GIR')
+
+
+def test_reference_date_drops_the_time_of_day():
+    assert reference_date(datetime(2025, 3, 3, 14, 30, 5)) == date(2025, 3, 3)
+    assert reference_date(date(2025, 3, 3)) == date(2025, 3, 3)
+    assert reference_date() == date.today()
+
+
+def test_datetimes_share_the_cache_entry_of_their_day(df):
+    analysis_cache.clear()
+    processor = DataProcessor()
+    expected = processor.analyze_data(df, as_of=date(2025, 3, 3))
+    for second in range(3):
+        assert processor.analyze_data(df, as_of=datetime(2025, 3, 3, 9, 0, second)) == expected
+    assert len(analysis_cache) == 1
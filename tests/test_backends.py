@@ -0,0 +1,48 @@
+"""Every compute backend gives byte-identical results to the pandas backend.
+
+The comparisons are those of benchmarks/check_backend_parity.py, on a small
+synthetic workbook; backends whose optional package is missing are skipped.
+"""
+import numpy as np
+import pytest
+
+from backends import BACKENDS
+from benchmarks.check_backend_parity import differences, outputs
+from benchmarks.generate_workbook import generate_workbook
+from data_processing import DataProcessor
+
+ROWS = 600
+
+
+@pytest.fixture(scope='module')
+def frames(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('workbooks') / 'inspection.xlsm')
+    generate_workbook(path, ROWS)
+    processor = DataProcessor('pandas')
+    df = processor.load_inspection_data(path, 'GIR')
+    return {
+        'full': df,
+        'slice': df.iloc[len(df) // 3:],
+        'empty': df.iloc[:0],
+        'sites': processor.load_sites({'GIR': path, 'DAL': path}),
+    }
+
+
+@pytest.fixture(params=[name for name in BACKENDS if name != 'pandas'])
+def processor(request):
+    try:
+        return DataProcessor(request.param)
+    except ImportError as e:
+        pytest.skip(str(e))
+
+
+@pytest.mark.parametrize('label', ['full', 'slice', 'empty'])
+def test_outputs_match_pandas(frames, processor, label):
+    df = frames[label]
+    assert differences(outputs(DataProcessor('pandas'), df), outputs(processor, df)) == []
+
+
+def test_per_site_counts_match_pandas(frames, processor):
+    sites = frames['sites']
+    expected = DataProcessor('pandas')._performance_counts(sites, by='Site')
+    np.testing.assert_array_equal(processor._performance_counts(sites, by='Site'), expected)
@@ -0,0 +1,52 @@
+from datetime import date
+
+import pytest
+
+from benchmarks.generate_workbook import generate_workbook
+from cache import file_fingerprint, read_file_bytes
+from data_processing import DataProcessor
+from history import HistoryStore, SnapshotConflict, workbook_fingerprint
+
+DAY = date(2025, 3, 3)
+
+
+@pytest.fixture(scope='module')
+def workbooks(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('workbooks')
+    loaded = []
+    for seed in range(2):
+        path = str(directory / f'inspection_{seed}.xlsm')
+        generate_workbook(path, 200, seed=seed)
+        df = DataProcessor().load_inspection_data(path, 'GIR')
+        loaded.append((df, workbook_fingerprint(file_fingerprint(read_file_bytes(path)), 'GIR')))
+    return loaded
+
+
+@pytest.fixture
+def store(tmp_path):
+    return HistoryStore(str(tmp_path / 'history.sqlite'))
+
+
+def test_recording_the_same_workbook_again_is_a_no_op(store, workbooks):
+    df, fingerprint = workbooks[0]
+    snapshot_id = store.record(df, 'GIR', fingerprint, DAY)
+    # A re-parse of the same file, e.g. after a parse version bump, keeps the snapshot
+    assert store.record(df.copy(), 'GIR', fingerprint, DAY) == snapshot_id
+    assert len(store.snapshots('GIR')) == 1
+    assert store.recorded_fingerprint('GIR', DAY) == fingerprint
+
+
+def test_a_different_workbook_needs_replace(store, workbooks):
+    (first, first_fingerprint), (second, second_fingerprint) = workbooks
+    store.record(first, 'GIR', first_fingerprint, DAY)
+    with pytest.raises(SnapshotConflict):
+        store.record(second, 'GIR', second_fingerprint, DAY)
+    assert store.snapshots('GIR')['total_rows'].tolist() == [len(first)]
+
+    store.record(second, 'GIR', second_fingerprint, DAY, replace=True)
+    assert store.recorded_fingerprint('GIR', DAY) == second_fingerprint
+    assert store.snapshots('GIR')['total_rows'].tolist() == [len(second)]
+
+
+def test_fingerprint_depends_on_site():
+    assert workbook_fingerprint('abc', 'GIR') != workbook_fingerprint('abc', 'DAL')
@@ -0,0 +1,36 @@
+import os
+import threading
+
+import pandas as pd
+
+import snapshot_store
+from snapshot_store import SnapshotStore
+
+
+def _frame(n):
+    return pd.DataFrame({'Month': pd.Series(range(n), dtype='int8'), 'Done': [True] * n})
+
+
+def test_lookups_do_not_wait_for_a_snapshot_being_written(tmp_path, monkeypatch):
+    store = SnapshotStore(str(tmp_path))
+    store.put('ready', _frame(3))
+    writing = threading.Event()
+    finish = threading.Event()
+    write_file = snapshot_store._write_file
+
+    def slow_write(path, df):
+        writing.set()
+        finish.wait(5)
+        write_file(path, df)
+
+    monkeypatch.setattr(snapshot_store, '_write_file', slow_write)
+    writer = threading.Thread(target=store.put, args=('slow', _frame(5)))
+    writer.start()
+    writing.wait(5)
+    lease = store.acquire('ready')
+    finish.set()
+    writer.join()
+
+    assert lease is not None and len(lease.frame) == 3
+    assert len(store.get('slow')) == 5
+    assert sorted(os.listdir(tmp_path)) == ['ready.arrow', 'slow.arrow']